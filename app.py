@@ -1,14 +1,29 @@
 import os
 import glob
-from flask import Flask, jsonify, request
-from sqlalchemy import select, insert, delete, update
-from utils.db_config import get_db_connection, ledger
-from utils.docker_utils import build_docker_image, run_docker_container, stop_docker_container
+import time
+from flask import Flask, Response, request
+from psycopg2.errors import UniqueViolation
+from sqlalchemy import select, insert, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from utils.db_config import get_db_connection, ledger, ledger_updates
+from utils.docker_utils import build_docker_image, discard_built_image, push_docker_image
 from utils.github_utils import recursive_repo_clone
-from utils.ledger_utils import calculate_new_balance, get_current_price, calculate_total_value
-from utils.ledger_manager import start_ledger
+from utils.ledger_utils import calculate_new_balance, calculate_total_value
+from utils.analytics import WINDOWS, get_ledger_stats
+from utils.ledger_cache import get_cached_view, invalidate_views, set_cached_view
+from utils.ledger_store import append_ledger_update, read_ledger, read_value_series
+from utils.ledger_usage import METRICS, USAGE_RETENTION_DAYS, profile_update, record_usage, update_writes, usage_report
+from utils.ledger_logs import list_tick_logs, read_tick_log
+from utils.ledger_events import publish_ledger_update, stream_ledger_updates
+from utils.ledger_manager import start_ledger, pause_ledger, resume_ledger, stop_ledger
+from utils.ledger_registry import LedgerInfo, lookup_ledger, register_ledger, unregister_ledger
+from utils.ledger_state import CREATED
+from utils.serializers import serialize_response
+from utils.snapshots import decode_snapshot, encode_snapshot, restore_snapshot, snapshot_records
+from utils.tasks import release_ledger, schedule_history_purge
+from utils.valuation import get_quote_snapshot
 from datetime import datetime, timezone
-import yfinance as yf
 
 API_KEY = os.environ.get("LEDGER_API_KEY")
 
@@ -27,7 +42,7 @@ def create_ledger():
         - algo_path: GitHub URL. Specific branch and filepath are supported, but optional. (e.g. 'https://github.com/Wat-Street/money-making/tree/main/projects/ledger_test_model')
         - updatetime: time interval for updates (minutes)
         - end: lifespan of instance (days)
-    It creates an entry in the database for the ledger, as well as generates a Docker image, saved as a tar file in [TODO directory]
+    It creates an entry in the database for the ledger, as well as generates a Docker image, pushed to the image registry (LEDGER_IMAGE_REGISTRY)
     """
     name = request.args.get("name")
     tickers_to_track = request.args.get("tickerstotrack", "").split(",")
@@ -37,7 +52,7 @@ def create_ledger():
 
     # input validation
     if not name or not algo_path or not update_time or not end_duration:
-        return jsonify({"error": "Missing required parameters"}), 400
+        return serialize_response({"error": "Missing required parameters"}, 400)
 
     try:
         # pull algorithm into local
@@ -46,23 +61,15 @@ def create_ledger():
         print(
             f"Successfully pulled algo {name} repo to temporary model storage")
 
-        # paths to pull algorithm and store image
+        # path to pull algorithm
         path_to_algo = f"{temp_model_store}"
-        path_to_image_store = f"docker_images/{name}.tar"
-
-        # check if image with this name already exists. If so, delete it first.
-        # Then, build it from the path_to_algo.
-        if os.path.exists(path_to_image_store):
-            os.remove(path_to_image_store)
 
         # build docker image
         image = build_docker_image(name, path_to_algo)
 
-        # save image as .tar to path_to_image_store
-        with open(path_to_image_store, "wb") as image_tar:
-            for chunk in image.save():
-                image_tar.write(chunk)
-        print(f"Saved Docker image for '{name}' to {path_to_image_store}")
+        # push image to the registry. workers pull it by digest, so a rebuilt image never mixes with an old one
+        image_ref = push_docker_image(image, name)
+        print(f"Pushed Docker image for '{name}' as {image_ref}")
 
         # delete the temporary model storage folder after image build
         for file in glob.glob("{temp_model_store}/*"):
@@ -77,18 +84,23 @@ def create_ledger():
                 algo_link=algo_path,
                 update_time=update_time,
                 end_duration=end_duration,
+                image=image_ref,
             )
             conn.execute(stmt)
             conn.commit()
 
+        register_ledger(
+            LedgerInfo(name, tickers_to_track, algo_path, update_time, end_duration, CREATED, None, image_ref)
+        )
+
         # start ledger after creation
         response, status_code = start_ledger(name)
 
-        return jsonify({"info": f"Ledger '{name}' has been created.", "start_status": response}), status_code
+        return serialize_response({"info": f"Ledger '{name}' has been created.", "start_status": response}, status_code)
 
     except Exception as e:
         print(e)
-        return jsonify({"error": str(e)}), 500
+        return serialize_response({"error": str(e)}, 500)
 
 
 @app.route("/view_ledger", methods=["GET"])
@@ -97,27 +109,203 @@ def view_ledger():
     This endpoint allows you to view a ledger.
     Expects: name of algorithm.
     Returns: a json containing the trades, holdings, value history, and balance of the ledger.
+    Also available as MessagePack, or as an Arrow stream of the value history (see utils/serializers.py).
+    Views are served from a short-lived cache and the read replica. Requests with a valid API key
+    (i.e. from the ledger's model) always read the primary, so a model sees its own updates.
     """
     name = request.args.get("name")
+    read_own_writes = validate_api_key()
+
+    if not read_own_writes:
+        cached = get_cached_view(name)
+        if cached is not None:
+            return serialize_response(cached, series_key="value")
 
     # retrieve ledger from database
-    with get_db_connection() as conn:
-        stmt = select(
-            ledger.c.trades, ledger.c.holding, ledger.c.value, ledger.c.balance
-        ).where(ledger.c.name == name)
-        result = conn.execute(stmt).fetchone()
+    with get_db_connection(readonly=not read_own_writes) as conn:
+        result = read_ledger(conn, name)
 
     # return result if not empty, 404 otherwise
     if result:
-        return jsonify(
-            {
-                "trades": result.trades,
-                "holding": result.holding,
-                "value": result.value,
-                "balance": result.balance,
-            }
-        )
-    return {"error": "Ledger not found"}, 404
+        payload = {
+            "trades": result.trades,
+            "holding": result.holding,
+            "value": result.value,
+            "balance": result.balance,
+        }
+        if not read_own_writes:
+            set_cached_view(name, payload)
+        return serialize_response(payload, series_key="value")
+    return serialize_response({"error": "Ledger not found"}, 404)
+
+
+@app.route("/ledger_stats", methods=["GET"])
+def ledger_stats():
+    """
+    This endpoint returns return and risk metrics of a ledger.
+    Expects: name of algorithm, and optionally window: number of most recent value points to use (20, 50, 100, 250 or all, the default).
+    Returns: a json containing the total return, mean return per point, annualized volatility and Sharpe ratio, maximum drawdown, and exposure (share of value held in stocks).
+    """
+    name = request.args.get("name")
+    window = request.args.get("window", "all")
+
+    if not name:
+        return serialize_response({"error": "Missing required parameter: name"}, 400)
+
+    if window not in WINDOWS:
+        return serialize_response({"error": f"window must be one of {', '.join(WINDOWS)}"}, 400)
+
+    # seeded from the primary: points a lagging replica misses would never reach the cache
+    def load_series():
+        with get_db_connection() as conn:
+            return read_value_series(conn, name)
+
+    stats = get_ledger_stats(name, WINDOWS[window], load_series)
+    if stats is None:
+        return serialize_response({"error": "Ledger not found"}, 404)
+    return serialize_response({"name": name, "window": window, **stats})
+
+
+@app.route("/ledger_stream", methods=["GET"])
+def ledger_stream():
+    """
+    This endpoint streams a ledger's updates as server-sent events.
+    Expects: name of algorithm.
+    Each event carries the trades, holding, balance and value point committed by one update_ledger call.
+    """
+    name = request.args.get("name")
+
+    if not name:
+        return serialize_response({"error": "Missing required parameter: name"}, 400)
+
+    if lookup_ledger(name) is None:
+        return serialize_response({"error": "Ledger not found"}, 404)
+
+    return Response(
+        stream_ledger_updates(name),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/ledger_logs", methods=["GET"])
+def ledger_logs():
+    """
+    This endpoint returns the output of a ledger's model containers. Requires a valid API key.
+    Expects: name of algorithm, and optionally tick_id (or "latest") with either offset/length or tail (bytes).
+    Without tick_id, returns the ticks that have stored output. With tick_id, returns that part of the tick's output.
+    """
+    if not validate_api_key():
+        return serialize_response({"error": "Unauthorized access. Valid API key required."}, 401)
+
+    name = request.args.get("name")
+    tick_id = request.args.get("tick_id")
+    offset = request.args.get("offset", 0, type=int)
+    length = request.args.get("length", type=int)
+    tail = request.args.get("tail", type=int)
+
+    if not name:
+        return serialize_response({"error": "Missing required parameter: name"}, 400)
+
+    if offset < 0 or (length is not None and length < 0) or (tail is not None and tail < 0):
+        return serialize_response({"error": "offset, length and tail must not be negative"}, 400)
+
+    if lookup_ledger(name) is None:
+        return serialize_response({"error": "Ledger not found"}, 404)
+
+    ticks = list_tick_logs(name)
+    if not tick_id:
+        return serialize_response({"name": name, "ticks": ticks})
+
+    if tick_id == "latest":
+        if not ticks:
+            return serialize_response({"error": "No logs for this ledger"}, 404)
+        tick_id = ticks[-1]["tick_id"]
+
+    log = read_tick_log(name, tick_id, offset=offset, length=length, tail=tail)
+    if log is None:
+        return serialize_response({"error": "No logs for this tick"}, 404)
+    return serialize_response({"name": name, **log, "data": log["data"].decode("utf-8", errors="replace")})
+
+
+@app.route("/ledger_usage", methods=["GET"])
+def ledger_usage():
+    """
+    This endpoint reports the resources each ledger consumed, most expensive first. Requires a valid API key.
+    Expects (all optional): days to cover (default 1, today only), name of a single ledger, sort: metric to rank by (default tick_seconds), limit (default 20).
+    Returns: per ledger, its ticks, tick wall time, container CPU time and peak memory, updates and their latency, DB rows and bytes written, and quote calls.
+    """
+    if not validate_api_key():
+        return serialize_response({"error": "Unauthorized access. Valid API key required."}, 401)
+
+    days = request.args.get("days", 1, type=int)
+    name = request.args.get("name")
+    sort = request.args.get("sort", "tick_seconds")
+    limit = request.args.get("limit", 20, type=int)
+
+    if not 1 <= days <= USAGE_RETENTION_DAYS or limit < 1:
+        return serialize_response({"error": f"days must be between 1 and {USAGE_RETENTION_DAYS}, and limit positive"}, 400)
+
+    if sort not in METRICS:
+        return serialize_response({"error": f"sort must be one of {', '.join(METRICS)}"}, 400)
+
+    return serialize_response({"days": days, "ledgers": usage_report(days, name, sort, limit)})
+
+
+@app.route("/export_ledger", methods=["GET"])
+def export_ledger():
+    """
+    This endpoint downloads a snapshot of a ledger: its config, holding, balance, trade log and value history. Requires a valid API key.
+    Expects: name of algorithm.
+    The snapshot is streamed as a gzip-compressed file (see utils/snapshots.py) and can be restored with import_ledger.
+    """
+    if not validate_api_key():
+        return serialize_response({"error": "Unauthorized access. Valid API key required."}, 401)
+
+    name = request.args.get("name")
+    if not name:
+        return serialize_response({"error": "Missing required parameter: name"}, 400)
+
+    if lookup_ledger(name) is None:
+        return serialize_response({"error": "Ledger not found"}, 404)
+
+    def generate():
+        with get_db_connection(readonly=True) as conn:
+            yield from encode_snapshot(snapshot_records(conn, name))
+
+    return Response(
+        generate(),
+        mimetype="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{name}.ledger.gz"'},
+    )
+
+
+@app.route("/import_ledger", methods=["POST"])
+def import_ledger():
+    """
+    This endpoint restores a ledger from a snapshot sent as the request body. Requires a valid API key.
+    Expects (optional): name to restore the ledger under, to fork it. Defaults to the name in the snapshot.
+    The restored ledger is created but not started.
+    """
+    if not validate_api_key():
+        return serialize_response({"error": "Unauthorized access. Valid API key required."}, 401)
+
+    name = request.args.get("name")
+
+    try:
+        with get_db_connection() as conn:
+            info, counts = restore_snapshot(conn, decode_snapshot(request.stream), name)
+            conn.commit()
+    except IntegrityError as e:
+        if isinstance(e.orig, UniqueViolation):
+            return serialize_response({"error": "A ledger with this name already exists"}, 409)
+        # any other constraint violation is bad data in the snapshot
+        return serialize_response({"error": f"Invalid snapshot: {e.orig}"}, 400)
+    except (ValueError, OSError, EOFError) as e:
+        return serialize_response({"error": f"Invalid snapshot: {e}"}, 400)
+
+    register_ledger(info)
+    return serialize_response({"info": f"Ledger '{info.name}' has been restored.", **counts}, 201)
 
 
 @app.route("/delete_ledger", methods=["GET"])
@@ -125,31 +313,44 @@ def delete_ledger():
     """
     This endpoint deletes a ledger instance.
     Expects: name of algorithm.
-    This function deletes the ledger instance from the database. The image persists in the docker_images folder.
+    This function stops the ledger's trade cycle and deletes the ledger instance from the database. Its trade and value history, and its image in the registry, are purged in the background.
     """
     name = request.args.get("name")
 
     if not name:
-        return {
+        return serialize_response({
                 "Error": f"You did not specify a ledger name. Usage: `/delete_ledger?name=insert_name`"
-            }, 400
+            }, 400)
 
     with get_db_connection() as conn:
-        # check if the ledger exists in the database
-        stmt = select(ledger.c.name).where(ledger.c.name == name)
-        result = conn.execute(stmt).fetchone()
-
-        if not result:
-            return {
+        # check if the ledger exists
+        info = lookup_ledger(name, conn)
+        if info is None:
+            return serialize_response({
                 "Error": f"You are trying to delete a ledger called '{name}' that does not exist."
-            }, 404
+            }, 404)
+
+        # forks restored from a snapshot share their source's image, which must outlive either ledger alone
+        image = info.image
+        if image is not None:
+            shared = conn.execute(
+                select(ledger.c.name).where(ledger.c.image == image, ledger.c.name != name).limit(1)
+            ).fetchone()
+            if shared:
+                image = None
 
         # delete the ledger from the table
         stmt = delete(ledger).where(ledger.c.name == name)
         conn.execute(stmt)
         conn.commit()
 
-    return {"Info": f"Deleted ledger named '{name}'"}
+    unregister_ledger(name)
+    invalidate_views([name])
+    release_ledger(name)
+    discard_built_image(name)
+    schedule_history_purge(name, image)
+
+    return serialize_response({"Info": f"Deleted ledger named '{name}'"})
 
 
 @app.route("/update_ledger", methods=["PATCH"])
@@ -161,60 +362,73 @@ def update_ledger():
     - trades: list of trades
     - value: dict of current stock values
     - balance: current balance 
+    - tick_id: (optional) the LEDGER_TICK_ID the model was run with. An update whose tick id was already applied is ignored, so retries are safe.
     This function takes the output of a model's trade function and updates the corresponding ledger instance's record.
     """
     # validate API key
     if not validate_api_key():
-        return jsonify({"error": "Unauthorized access. Valid API key required."}), 401
+        return serialize_response({"error": "Unauthorized access. Valid API key required."}, 401)
 
     data = request.json
     name = data.get("name")
     new_trades = data.get("trades")
     new_holdings = data.get("holding")
+    tick_id = data.get("tick_id")
     # pass to view_ledger so that timestamp can be displayed
     timestamp = datetime.now(timezone.utc)
 
     # validate required fields
     if None in [name, new_trades, new_holdings]:
-        return jsonify({"error": "Missing required fields. Please provide name, trades, and holding."}), 400
+        return serialize_response({"error": "Missing required fields. Please provide name, trades, and holding."}, 400)
 
+    started = time.perf_counter()
     try:
-        with get_db_connection() as conn:
-            # fetch current ledger data
-            stmt = select(ledger).where(ledger.c.name == name)
+        with profile_update(name), get_db_connection() as conn:
+            # fetch current balance, locking the row so concurrent updates apply one at a time
+            stmt = select(ledger.c.name, ledger.c.balance).where(ledger.c.name == name).with_for_update()
             result = conn.execute(stmt).fetchone()
 
             if not result:
-                return jsonify({"error": f"You are trying to update a ledger called '{name}' that does not exist."}), 404
+                return serialize_response({"error": f"You are trying to update a ledger called '{name}' that does not exist."}, 404)
+
+            # record the tick in the same transaction as the update, so it is applied exactly once
+            if tick_id is not None:
+                stmt = pg_insert(ledger_updates).values(
+                    ledger_name=name,
+                    tick_id=str(tick_id),
+                    trade_count=len(new_trades),
+                ).on_conflict_do_nothing().returning(ledger_updates.c.tick_id)
 
-            # update trades
-            updated_trades = result.trades + new_trades
+                if conn.execute(stmt).fetchone() is None:
+                    conn.rollback()
+                    return serialize_response({"message": f"Tick '{tick_id}' was already applied to ledger '{name}'", "duplicate": True}, 200)
 
             # calculate new balance based on trades
             new_balance = calculate_new_balance(result.balance, new_trades)
 
-            # calculate current total value
-            current_value = calculate_total_value(new_holdings, new_balance)
-
-            # update ledger in database
-            update_stmt = (
-                update(ledger)
-                .where(ledger.c.name == name)
-                .values(
-                    trades=updated_trades,
-                    holding=new_holdings,
-                    balance=new_balance,
-                    value={str(timestamp): current_value, **result.value},
-                )
-            )
-            conn.execute(update_stmt)
+            # calculate current total value, reusing the latest quote snapshot where possible
+            snapshot = get_quote_snapshot(new_holdings)
+            current_value = calculate_total_value(new_holdings, new_balance, snapshot)
+
+            # append the trades and value point to the ledger's history
+            append_ledger_update(conn, name, timestamp, new_trades, new_holdings, new_balance, current_value, tick_id)
             conn.commit()
 
-        return jsonify({"message": f"Ledger '{name}' updated successfully"}), 200
+        invalidate_views([name])
+        publish_ledger_update(name, timestamp, new_trades, new_holdings, new_balance, current_value)
+        record_usage(
+            name,
+            updates=1,
+            update_seconds=time.perf_counter() - started,
+            quote_calls=len(set(new_holdings) - set(snapshot)),
+            **update_writes(new_trades, new_holdings, tick_id),
+        )
+
+        return serialize_response({"message": f"Ledger '{name}' updated successfully"}, 200)
 
     except Exception as e:
         print(e)
-        return jsonify({"error": str(e)}), 500
+        return serialize_response({"error": str(e)}, 500)
 
 
 @app.route("/start_ledger", methods=["GET"])
@@ -224,16 +438,50 @@ def start_ledger_endpoint():
     This endpoint starts a ledger instance.
     Expects: name of the ledger to start.
     """
-    # Validate API key
+    return lifecycle_endpoint(start_ledger)
+
+
+@app.route("/pause_ledger", methods=["GET"])
+def pause_ledger_endpoint():
+    """
+    PRIVATE ENDPOINT - Requires valid API key.
+    This endpoint pauses a running ledger instance.
+    Expects: name of the ledger to pause.
+    """
+    return lifecycle_endpoint(pause_ledger)
+
+
+@app.route("/resume_ledger", methods=["GET"])
+def resume_ledger_endpoint():
+    """
+    PRIVATE ENDPOINT - Requires valid API key.
+    This endpoint resumes a paused ledger instance.
+    Expects: name of the ledger to resume.
+    """
+    return lifecycle_endpoint(resume_ledger)
+
+
+@app.route("/stop_ledger", methods=["GET"])
+def stop_ledger_endpoint():
+    """
+    PRIVATE ENDPOINT - Requires valid API key.
+    This endpoint stops a running or paused ledger instance. Its history is kept.
+    Expects: name of the ledger to stop.
+    """
+    return lifecycle_endpoint(stop_ledger)
+
+
+def lifecycle_endpoint(action):
+    """Validates the request and applies a lifecycle action (start/pause/resume/stop) to the named ledger."""
     if not validate_api_key():
-        return jsonify({"error": "Unauthorized access. Valid API key required."}), 401
+        return serialize_response({"error": "Unauthorized access. Valid API key required."}, 401)
 
     name = request.args.get("name")
     if not name:
-        return jsonify({"error": "Missing required parameter: name"}), 400
+        return serialize_response({"error": "Missing required parameter: name"}, 400)
 
-    response, status_code = start_ledger(name)
-    return jsonify(response), status_code
+    response, status_code = action(name)
+    return serialize_response(response, status_code)
 
 
 def validate_api_key():
@@ -0,0 +1,64 @@
+"""
+Measures the cold-start import cost of the API and worker entry points.
+
+Each entry point is imported in a fresh interpreter with `-X importtime`, several times, and the
+median total import time is reported along with the slowest packages it pulled in on the last run.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--top N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ENTRY_POINTS = ["wsgi", "worker"]
+# repo modules and interpreter startup, left out of the per-package breakdown
+IGNORED = set(ENTRY_POINTS) | {"app", "utils", "site"}
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module):
+    """Import `module` in a fresh interpreter and return {top-level package: cumulative microseconds}."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        if "." not in name:
+            times[name] = max(times.get(name, 0), int(cumulative))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    for module in ENTRY_POINTS:
+        totals = []
+        for _ in range(args.runs):
+            times = import_times(module)
+            totals.append(times[module])
+
+        print(f"{module}: median {statistics.median(totals) / 1000:.1f} ms over {args.runs} runs")
+        heaviest = sorted(
+            ((name, us) for name, us in times.items() if name not in IGNORED),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        for name, us in heaviest[:args.top]:
+            print(f"    {name:<30} {us / 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
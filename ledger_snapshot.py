@@ -0,0 +1,76 @@
+"""
+Snapshot CLI: export, restore and fork ledgers (see utils/snapshots.py).
+
+    python ledger_snapshot.py export NAME [FILE]           # FILE defaults to NAME.ledger.gz
+    python ledger_snapshot.py import FILE [--name NEW]     # restore, optionally under a new name
+    python ledger_snapshot.py fork NAME NEW                # copy a ledger without an intermediate file
+
+--db URL reads from or writes to another database, e.g. to move a ledger between deployments.
+Restored ledgers are created but not started.
+"""
+import argparse
+
+from sqlalchemy import create_engine
+
+from utils.db_config import get_db_connection
+from utils.ledger_registry import register_ledger
+from utils.snapshots import decode_snapshot, encode_snapshot, restore_snapshot, snapshot_records
+
+
+def connect(url):
+    return create_engine(url).connect() if url else get_db_connection()
+
+
+def export_command(args):
+    path = args.file or f"{args.name}.ledger.gz"
+    with connect(args.db) as conn, open(path, "wb") as snapshot:
+        for chunk in encode_snapshot(snapshot_records(conn, args.name)):
+            snapshot.write(chunk)
+    print(f"Exported ledger '{args.name}' to {path}")
+
+
+def restore(conn, records, name, url):
+    info, counts = restore_snapshot(conn, records, name)
+    conn.commit()
+    # ledgers restored into another database are not known to this deployment's processes
+    if not url:
+        register_ledger(info)
+    print(f"Restored ledger '{info.name}' with {counts['trades']} trades and {counts['values']} values")
+
+
+def import_command(args):
+    with connect(args.db) as conn, open(args.file, "rb") as snapshot:
+        restore(conn, decode_snapshot(snapshot), args.name, args.db)
+
+
+def fork_command(args):
+    with connect(args.db) as conn:
+        restore(conn, snapshot_records(conn, args.name), args.new_name, args.db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export, restore and fork ledger snapshots.")
+    parser.add_argument("--db", help="database URL to use instead of the configured database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="write a ledger's snapshot to a file")
+    export_parser.add_argument("name")
+    export_parser.add_argument("file", nargs="?")
+    export_parser.set_defaults(run=export_command)
+
+    import_parser = commands.add_parser("import", help="restore a ledger from a snapshot file")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--name", help="restore under this name instead of the snapshot's")
+    import_parser.set_defaults(run=import_command)
+
+    fork_parser = commands.add_parser("fork", help="copy a ledger under a new name")
+    fork_parser.add_argument("name")
+    fork_parser.add_argument("new_name")
+    fork_parser.set_defaults(run=fork_command)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+"""
+Quote feed entry point: `python quote_feed.py`, one per worker host.
+Runs the quote fan-out service (see utils/quote_feed.py). The provider is chosen with
+LEDGER_QUOTE_PROVIDER (yfinance, or synthetic for a random walk without market data).
+"""
+import os
+
+from utils.quote_feed import QuoteFeed, get_provider
+
+if __name__ == "__main__":
+    QuoteFeed(get_provider(), node=os.environ.get("LEDGER_WORKER_NODE")).run()
@@ -6,13 +6,68 @@ CREATE TABLE order_books_v2 (
     update_time INT NOT NULL,
     end_duration INT NOT NULL,
     trades JSONB DEFAULT '[]',
-    worth NUMERIC[] DEFAULT '{}',
+    holding JSONB DEFAULT '{}',
+    value JSONB DEFAULT '{}',
     balance NUMERIC NOT NULL DEFAULT 100000,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- databases created from the first version of this file have a `worth` column instead of holding/value
+ALTER TABLE order_books_v2 ADD COLUMN IF NOT EXISTS holding JSONB DEFAULT '{}';
+ALTER TABLE order_books_v2 ADD COLUMN IF NOT EXISTS value JSONB DEFAULT '{}';
+ALTER TABLE order_books_v2 DROP COLUMN IF EXISTS worth;
+
 -- creating user
 CREATE USER reebxu WITH SUPERUSER PASSWORD 'watstreet';
 -- database name: postgres
 
 
+
+
+-- ledger lifecycle status and persisted schedule start
+ALTER TABLE order_books_v2 ADD COLUMN IF NOT EXISTS status TEXT NOT NULL DEFAULT 'created';
+ALTER TABLE order_books_v2 ADD COLUMN IF NOT EXISTS start_time TIMESTAMP;
+
+-- registry reference of the ledger's image, pinned by digest
+ALTER TABLE order_books_v2 ADD COLUMN IF NOT EXISTS image TEXT;
+
+
+-- tick log and applied-update dedup keys
+CREATE TABLE IF NOT EXISTS ledger_ticks (
+    ledger_name TEXT REFERENCES order_books_v2 (name) ON DELETE CASCADE,
+    tick_id TEXT,
+    started_at TIMESTAMP NOT NULL,
+    finished_at TIMESTAMP NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    PRIMARY KEY (ledger_name, tick_id)
+);
+
+CREATE TABLE IF NOT EXISTS ledger_updates (
+    ledger_name TEXT REFERENCES order_books_v2 (name) ON DELETE CASCADE,
+    tick_id TEXT,
+    trade_count INT NOT NULL,
+    applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (ledger_name, tick_id)
+);
+
+
+-- trade and value history, partitioned by month.
+-- monthly partitions (e.g. ledger_trades_2026_10) are created by the application.
+CREATE TABLE IF NOT EXISTS ledger_trades (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+    executed_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    ledger_name TEXT NOT NULL,
+    tick_id TEXT,
+    trade JSONB NOT NULL,
+    PRIMARY KEY (id, executed_at)
+) PARTITION BY RANGE (executed_at);
+
+CREATE INDEX IF NOT EXISTS ledger_trades_ledger_idx ON ledger_trades (ledger_name, executed_at);
+
+CREATE TABLE IF NOT EXISTS ledger_values (
+    ledger_name TEXT NOT NULL,
+    recorded_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    value NUMERIC NOT NULL,
+    PRIMARY KEY (ledger_name, recorded_at)
+) PARTITION BY RANGE (recorded_at);
@@ -23,19 +23,18 @@ def mock_db_connection():
 def mock_dependencies():
     with patch('app.recursive_repo_clone') as mock_clone, \
             patch('app.build_docker_image') as mock_docker_build, \
-            patch('app.start_ledger') as mock_start_ledger, \
-            patch('app.open', create=True) as mock_open:
+            patch('app.push_docker_image') as mock_docker_push, \
+            patch('app.start_ledger') as mock_start_ledger:
 
-        mock_docker = Mock()
-        mock_docker.save.return_value = [b'mock_image_data']
-        mock_docker_build.return_value = mock_docker
+        mock_docker_build.return_value = Mock()
+        mock_docker_push.return_value = "localhost:5000/ledger-test_ledger@sha256:abc123"
         mock_start_ledger.return_value = ({"status": "success"}, 200)
 
         yield {
             'clone': mock_clone,
             'docker_build': mock_docker_build,
-            'start_ledger': mock_start_ledger,
-            'open': mock_open
+            'docker_push': mock_docker_push,
+            'start_ledger': mock_start_ledger
         }
 
 
@@ -44,3 +43,26 @@ def mock_api_key_validation():
     with patch('app.validate_api_key') as mock_validate:
         mock_validate.return_value = True
         yield mock_validate
+
+
+@pytest.fixture(autouse=True)
+def mock_redis():
+    """Replace the shared Redis client so no test talks to a real server."""
+    from utils import redis_utils
+    redis_utils._redis_client = MagicMock()
+    yield redis_utils._redis_client
+    redis_utils._redis_client = None
+
+
+@pytest.fixture(autouse=True)
+def ledger_registry():
+    """Start every test with an empty, already-loaded registry that is receiving invalidations."""
+    from utils import ledger_registry
+    ledger_registry._registry.clear()
+    ledger_registry._loaded = True
+    ledger_registry._listener = MagicMock()
+    yield ledger_registry
+    ledger_registry._registry.clear()
+    ledger_registry._loaded = False
+    ledger_registry._listener = None
+    ledger_registry._listener_retry_at = 0
@@ -0,0 +1,126 @@
+import math
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch, MagicMock
+from utils import analytics
+from utils.analytics import RollingStats, compute_metrics
+
+
+def _series(values):
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [start + timedelta(days=i) for i in range(len(values))], values
+
+
+@pytest.fixture(autouse=True)
+def clear_stats():
+    analytics._stats.clear()
+    analytics._pending.clear()
+    analytics._listener = MagicMock()
+    yield
+    analytics._stats.clear()
+    analytics._pending.clear()
+    analytics._listener = None
+    analytics._listener_retry_at = 0
+
+
+def test_compute_metrics():
+    timestamps, values = _series([100, 110, 99, 120])
+
+    metrics = compute_metrics(timestamps, values, balance=30)
+
+    assert metrics["points"] == 4
+    assert metrics["total_return"] == pytest.approx(0.2)
+    assert metrics["max_drawdown"] == pytest.approx(99 / 110 - 1)
+    assert metrics["exposure"] == pytest.approx(0.75)
+    returns = [0.1, 99 / 110 - 1, 120 / 99 - 1]
+    mean = sum(returns) / 3
+    std = math.sqrt(sum((r - mean) ** 2 for r in returns) / 2)
+    assert metrics["sharpe"] == pytest.approx(mean / std * math.sqrt(365.25))
+
+
+def test_compute_metrics_single_point():
+    metrics = compute_metrics(*_series([100]))
+    assert metrics["total_return"] is None
+    assert metrics["volatility"] is None
+
+
+def test_rolling_stats_matches_full_recomputation():
+    """Adding points one at a time gives the same metrics as recomputing the window from scratch"""
+    timestamps, values = _series([100, 103, 101, 108, 104, 111, 115, 109, 120, 118])
+    stats = RollingStats.from_series(timestamps[:3], values[:3], window=5)
+    for ts, value in zip(timestamps[3:], values[3:]):
+        stats.add(ts, value, balance=50)
+    stats.add(timestamps[4], 1)  # replayed point is ignored
+
+    expected = compute_metrics(timestamps[-5:], values[-5:], balance=50)
+    for key, value in stats.metrics().items():
+        assert value == pytest.approx(expected[key])
+
+
+def test_get_ledger_stats_caches_and_follows_updates():
+    timestamps, values = _series([100, 110])
+    load_series = MagicMock(return_value=(timestamps, values, 100.0))
+
+    assert analytics.get_ledger_stats("demo", None, load_series)["points"] == 2
+    analytics._handle_update({"data": (
+        '{"name": "demo", "timestamp": "2025-01-03 00:00:00+00:00", "value": 121, "balance": 100}'
+    )})
+    metrics = analytics.get_ledger_stats("demo", None, load_series)
+
+    load_series.assert_called_once()
+    assert metrics["points"] == 3
+    assert metrics["total_return"] == pytest.approx(0.21)
+
+
+def test_rolling_stats_window_counts_points():
+    timestamps, values = _series([100, 103, 101, 108, 104])
+    stats = RollingStats.from_series(timestamps, values, window=3)
+    stats.add(timestamps[-1] + timedelta(days=1), 110)
+
+    assert stats.metrics()["points"] == 3
+    assert stats.metrics()["total_return"] == pytest.approx(110 / 108 - 1)
+
+
+def test_get_ledger_stats_keeps_updates_during_load():
+    """Updates published while the history loads are applied to the cached entry"""
+    timestamps, values = _series([100, 110])
+
+    def load_series():
+        analytics._handle_update({"data": (
+            '{"name": "demo", "timestamp": "2025-01-03 00:00:00+00:00", "value": 121, "balance": 40}'
+        )})
+        return timestamps, values, 100.0
+
+    metrics = analytics.get_ledger_stats("demo", None, load_series)
+
+    assert metrics["points"] == 3
+    assert metrics["exposure"] == pytest.approx(1 - 40 / 121)
+    assert analytics._stats[("demo", None)].metrics() == metrics
+    assert analytics._pending == {}
+
+
+def test_get_ledger_stats_without_listener_reads_every_time(mock_redis):
+    """Windows are not cached while the update subscription is down"""
+    analytics._listener = None
+    mock_redis.pubsub.side_effect = ConnectionError("redis went away")
+    load_series = MagicMock(return_value=_series([100, 110, 121]) + (100.0,))
+
+    assert analytics.get_ledger_stats("demo", 2, load_series)["total_return"] == pytest.approx(0.1)
+    assert analytics.get_ledger_stats("demo", 2, load_series)["points"] == 2
+
+    assert load_series.call_count == 2
+    assert analytics._stats == {}
+    mock_redis.pubsub.assert_called_once()
+
+
+def test_ledger_stats_endpoint(client):
+    response = client.get("/ledger_stats?name=demo&window=7")
+    assert response.status_code == 400
+
+    with patch("app.read_value_series", return_value=_series([100, 110]) + (50.0,)), \
+            patch("app.get_db_connection"):
+        response = client.get("/ledger_stats?name=demo&window=20")
+
+    assert response.status_code == 200
+    assert response.json["window"] == "20"
+    assert response.json["total_return"] == pytest.approx(0.1)
@@ -19,6 +19,11 @@ def test_create_ledger_success(client, mock_db_connection, mock_dependencies):
     assert response.status_code == 200
     assert b"has been created" in response.data
 
+    # the image is pushed to the registry and the ledger pinned to its digest
+    mock_dependencies['docker_push'].assert_called_once_with(mock_dependencies['docker_build'].return_value, 'test_ledger')
+    stmt = mock_db_connection.execute.call_args[0][0]
+    assert stmt.compile().params["image"] == "localhost:5000/ledger-test_ledger@sha256:abc123"
+
 
 def test_create_ledger_missing_parameters(client):
     # Test with no parameters
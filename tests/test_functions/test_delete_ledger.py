@@ -1,10 +1,18 @@
 from flask import Flask, jsonify
 from unittest.mock import patch, MagicMock
 
-def test_delete_ledger_success(client, mock_db_connection):
+@patch("app.discard_built_image")
+@patch("app.schedule_history_purge")
+@patch("app.release_ledger")
+def test_delete_ledger_success(mock_release, mock_purge, mock_discard, client, mock_db_connection, ledger_registry):
     """Test successful deletion"""
+    image = "localhost:5000/ledger-test_ledger@sha256:abc123"
+    ledger_registry.register_ledger(
+        ledger_registry.LedgerInfo("test_ledger", ["AAPL"], "link", 5, 7, "running", None, image)
+    )
+    # no other ledger uses the image
     mock_select_result = MagicMock()
-    mock_select_result.fetchone.return_value = ("test_ledger",)
+    mock_select_result.fetchone.return_value = None
     mock_db_connection.execute.return_value = mock_select_result
 
     response = client.get("/delete_ledger?name=test_ledger")
@@ -17,6 +25,31 @@ def test_delete_ledger_success(client, mock_db_connection):
     mock_db_connection.execute.assert_called()
     mock_db_connection.commit.assert_called_once()  # ensure commit happened
 
+    # the registry should no longer know about the ledger
+    assert "test_ledger" not in ledger_registry._registry
+    # and its trade cycle should be released
+    mock_release.assert_called_once_with("test_ledger")
+    # and its history and image purged in the background
+    mock_purge.assert_called_once_with("test_ledger", image)
+    mock_discard.assert_called_once_with("test_ledger")
+
+
+@patch("app.discard_built_image")
+@patch("app.schedule_history_purge")
+@patch("app.release_ledger")
+def test_delete_ledger_keeps_shared_image(mock_release, mock_purge, mock_discard, client, mock_db_connection, ledger_registry):
+    """Test that deleting a ledger whose image a fork still uses leaves the image in place"""
+    image = "localhost:5000/ledger-test_ledger@sha256:abc123"
+    ledger_registry.register_ledger(
+        ledger_registry.LedgerInfo("test_ledger", ["AAPL"], "link", 5, 7, "running", None, image)
+    )
+    mock_db_connection.execute.return_value.fetchone.return_value = ("test_fork",)
+
+    response = client.get("/delete_ledger?name=test_ledger")
+
+    assert response.status_code == 200
+    mock_purge.assert_called_once_with("test_ledger", None)
+
 
 def test_delete_ledger_nonexistent(client, mock_db_connection):
     """Test unsuccessful deletion in the case where the ledger dne"""
@@ -0,0 +1,96 @@
+from unittest.mock import patch, MagicMock
+
+import docker
+import pytest
+
+from utils.docker_utils import delete_registry_image, ensure_docker_image, push_docker_image
+from utils.ledger_store import image_in_use
+from utils.tasks import purge_ledger_history_task
+
+IMAGE_REF = "localhost:5000/ledger-demo@sha256:abc123"
+
+
+@patch("utils.docker_utils.get_docker_client")
+def test_push_returns_digest_reference(mock_client):
+    """
+    Test that pushing tags the image for the ledger's repository and returns its digest reference.
+    """
+    image = MagicMock()
+    mock_client.return_value.images.push.return_value = [
+        {"status": "Layer already exists"},
+        {"status": "latest: digest: sha256:abc123"},
+        {"aux": {"Tag": "latest", "Digest": "sha256:abc123", "Size": 1234}},
+    ]
+
+    assert push_docker_image(image, "demo") == IMAGE_REF
+    image.tag.assert_called_once_with("localhost:5000/ledger-demo", "latest")
+
+
+@patch("utils.docker_utils.get_docker_client")
+def test_push_raises_on_error(mock_client):
+    """
+    Test that a push error reported in the status stream is raised.
+    """
+    mock_client.return_value.images.push.return_value = [{"error": "denied"}]
+
+    with pytest.raises(RuntimeError, match="denied"):
+        push_docker_image(MagicMock(), "demo")
+
+
+@patch("utils.docker_utils.get_docker_client")
+def test_ensure_image_pulls_missing_digest(mock_client):
+    """
+    Test that a digest reference missing on this node is pulled, and a present one is not.
+    """
+    images = mock_client.return_value.images
+    images.get.side_effect = docker.errors.ImageNotFound("missing")
+    ensure_docker_image(IMAGE_REF)
+    images.pull.assert_called_once_with(IMAGE_REF)
+
+    images.reset_mock()
+    images.get.side_effect = None
+    ensure_docker_image(IMAGE_REF)
+    images.pull.assert_not_called()
+
+
+@patch("utils.docker_utils.requests")
+def test_delete_registry_image(mock_requests):
+    """
+    Test that deleting an image removes its manifest from the registry by digest.
+    """
+    mock_requests.delete.return_value = MagicMock(status_code=202)
+
+    delete_registry_image(IMAGE_REF)
+
+    assert mock_requests.delete.call_args[0][0] == "http://localhost:5000/v2/ledger-demo/manifests/sha256:abc123"
+
+
+def test_image_in_use_matches_digest():
+    """
+    Test that an image counts as in use when any ledger's image has its digest.
+    """
+    conn = MagicMock()
+    conn.execute.return_value.fetchone.return_value = ("demo_fork",)
+
+    assert image_in_use(conn, IMAGE_REF)
+    query = conn.execute.call_args[0][0].compile()
+    assert query.params["image_1"] == "@sha256:abc123"
+
+
+@pytest.mark.parametrize("in_use", [True, False])
+@patch("utils.tasks.delete_ledger_logs")
+@patch("utils.tasks.purge_ledger_history", return_value=0)
+@patch("utils.tasks.delete_registry_image")
+@patch("utils.tasks.remove_docker_image")
+@patch("utils.tasks.image_in_use")
+@patch("utils.tasks.get_db_connection")
+def test_purge_keeps_image_still_in_use(mock_conn, mock_in_use, mock_remove, mock_delete, mock_purge, mock_logs, in_use):
+    """
+    Test that purging a deleted ledger leaves its image alone if another ledger has used it since.
+    """
+    mock_in_use.return_value = in_use
+
+    purge_ledger_history_task.call_local("demo", None, IMAGE_REF)
+
+    assert mock_delete.called is not in_use
+    assert mock_remove.called is not in_use
@@ -0,0 +1,80 @@
+from unittest.mock import patch, MagicMock
+
+import utils.redis_utils
+from utils.ledger_cache import VIEW_CACHE_KEY, get_cached_view, invalidate_views, set_cached_view
+
+VIEW = {"trades": [], "holding": {"AAPL": 10}, "value": [], "balance": 100000}
+
+
+def test_cached_view_round_trip():
+    """
+    Test that a cached view is stored with a TTL and read back.
+    """
+    redis = utils.redis_utils._redis_client
+    set_cached_view("test_ledger", VIEW)
+    key, payload = redis.set.call_args.args
+    assert key == VIEW_CACHE_KEY.format("test_ledger")
+    assert redis.set.call_args.kwargs["ex"] > 0
+
+    redis.get.return_value = payload
+    assert get_cached_view("test_ledger") == VIEW
+
+
+def test_invalidate_views():
+    """
+    Test that invalidation deletes every given ledger's view in one call.
+    """
+    invalidate_views(["a", "b"])
+    utils.redis_utils._redis_client.delete.assert_called_once_with(
+        VIEW_CACHE_KEY.format("a"), VIEW_CACHE_KEY.format("b"))
+
+
+@patch('app.get_db_connection')
+@patch('app.validate_api_key', return_value=False)
+def test_view_ledger_served_from_cache(mock_validate, mock_get_db_connection, client):
+    """
+    Test that an anonymous view is served from the cache without touching the database.
+    """
+    utils.redis_utils._redis_client.get.return_value = b'{"trades": [], "holding": {"AAPL": 10}, "value": [], "balance": 100000}'
+
+    response = client.get("/view_ledger?name=test_ledger")
+
+    assert response.status_code == 200
+    assert response.json == VIEW
+    mock_get_db_connection.assert_not_called()
+
+
+@patch('app.get_db_connection')
+@patch('app.validate_api_key', return_value=False)
+def test_view_ledger_cache_miss_reads_replica(mock_validate, mock_get_db_connection, client):
+    """
+    Test that an anonymous cache miss reads the replica and fills the cache.
+    """
+    redis = utils.redis_utils._redis_client
+    redis.get.return_value = None
+    mock_conn = MagicMock()
+    mock_get_db_connection.return_value.__enter__.return_value = mock_conn
+    mock_conn.execute.return_value.fetchone.return_value = MagicMock(**VIEW)
+
+    response = client.get("/view_ledger?name=test_ledger")
+
+    assert response.status_code == 200
+    mock_get_db_connection.assert_called_once_with(readonly=True)
+    assert redis.set.call_args.args[0] == VIEW_CACHE_KEY.format("test_ledger")
+
+
+@patch('app.get_db_connection')
+def test_view_ledger_owner_reads_primary(mock_get_db_connection, client):
+    """
+    Test that a request with a valid API key bypasses the cache and reads the primary.
+    """
+    mock_conn = MagicMock()
+    mock_get_db_connection.return_value.__enter__.return_value = mock_conn
+    mock_conn.execute.return_value.fetchone.return_value = MagicMock(**VIEW)
+
+    response = client.get("/view_ledger?name=test_ledger")
+
+    assert response.status_code == 200
+    mock_get_db_connection.assert_called_once_with(readonly=False)
+    utils.redis_utils._redis_client.get.assert_not_called()
+    utils.redis_utils._redis_client.set.assert_not_called()
@@ -0,0 +1,70 @@
+from datetime import datetime
+from unittest.mock import patch
+from utils.ledger_manager import start_ledger, pause_ledger, resume_ledger, stop_ledger
+from utils.ledger_registry import LedgerInfo
+
+
+def _info(status, start_time=None):
+    return LedgerInfo("demo", ["AAPL"], "link", 5, 7, status, start_time)
+
+
+@patch("utils.ledger_manager.start_trade_cycle")
+@patch("utils.ledger_manager.revoke_next_task")
+@patch("utils.ledger_manager.transition_ledger")
+@patch("utils.ledger_manager.lookup_ledger")
+def test_start_running_ledger_keeps_start_time(mock_lookup, mock_transition, mock_revoke, mock_run):
+    """Restarting a ledger that crashed while running resumes its original schedule"""
+    started = datetime(2025, 1, 1)
+    mock_lookup.return_value = _info("running", started)
+    mock_transition.return_value = _info("running", started)
+
+    response, status_code = start_ledger("demo")
+
+    assert status_code == 202
+    assert mock_transition.call_args.kwargs["start_time"] == started
+    mock_revoke.assert_called_once_with("demo")
+    assert mock_run.call_args[0][3] == started
+
+
+@patch("utils.ledger_manager.start_trade_cycle")
+@patch("utils.ledger_manager.transition_ledger")
+@patch("utils.ledger_manager.lookup_ledger")
+def test_start_paused_ledger_conflict(mock_lookup, mock_transition, mock_run):
+    mock_lookup.return_value = _info("paused", datetime(2025, 1, 1))
+    mock_transition.return_value = None
+
+    response, status_code = start_ledger("demo")
+
+    assert status_code == 409
+    mock_run.assert_not_called()
+
+
+@patch("utils.ledger_manager.release_ledger")
+@patch("utils.ledger_manager.transition_ledger")
+@patch("utils.ledger_manager.lookup_ledger")
+def test_pause_and_stop_release_resources(mock_lookup, mock_transition, mock_release):
+    mock_lookup.return_value = _info("running")
+    mock_transition.return_value = _info("paused")
+
+    assert pause_ledger("demo")[1] == 200
+    assert stop_ledger("demo")[1] == 200
+    assert mock_release.call_count == 2
+
+
+@patch("utils.ledger_manager.start_trade_cycle")
+@patch("utils.ledger_manager.transition_ledger")
+@patch("utils.ledger_manager.lookup_ledger")
+def test_resume_not_paused(mock_lookup, mock_transition, mock_run):
+    mock_lookup.return_value = _info("running")
+    mock_transition.return_value = None
+
+    response, status_code = resume_ledger("demo")
+
+    assert status_code == 409
+    mock_run.assert_not_called()
+
+
+def test_lifecycle_endpoints_missing_name(client):
+    for endpoint in ["/pause_ledger", "/resume_ledger", "/stop_ledger"]:
+        response = client.get(endpoint)
+        assert response.status_code == 400
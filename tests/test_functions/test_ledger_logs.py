@@ -0,0 +1,121 @@
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+
+import docker
+
+from utils.docker_utils import stream_docker_container
+from utils.ledger_logs import (
+    MAX_TICK_LOG_BYTES, TAIL_BYTES, TickLogWriter, list_tick_logs, read_tick_log, rotate_tick_logs
+)
+
+
+def write_tick(log_dir, tick_id, chunks, started_at=datetime(2025, 4, 5, 12, 0)):
+    with TickLogWriter("ledger1", tick_id, started_at, log_dir=str(log_dir)) as log:
+        for chunk in chunks:
+            log.write(chunk)
+
+
+def test_tick_log_range_and_tail_reads(tmp_path):
+    """
+    Test that output written in chunks can be read back by range and by tail.
+    """
+    write_tick(tmp_path, "abc", [b"hello ", b"model ", b"output"])
+
+    assert read_tick_log("ledger1", "abc", log_dir=str(tmp_path))["data"] == b"hello model output"
+    part = read_tick_log("ledger1", "abc", offset=6, length=5, log_dir=str(tmp_path))
+    assert part["data"] == b"model"
+    assert part["eof"] is False
+    tail = read_tick_log("ledger1", "abc", tail=6, log_dir=str(tmp_path))
+    assert tail == {"tick_id": "abc", "offset": 12, "data": b"output", "eof": True}
+    assert read_tick_log("ledger1", "missing", log_dir=str(tmp_path)) is None
+
+
+def test_tick_log_is_capped(tmp_path):
+    """
+    Test that a huge output keeps its beginning and its last TAIL_BYTES, with a truncation marker.
+    """
+    chunk = b"x" * 65536
+    write_tick(tmp_path, "big", [b"START"] + [chunk] * 40 + [b"END"])
+
+    data = read_tick_log("ledger1", "big", log_dir=str(tmp_path))["data"]
+    assert data.startswith(b"START")
+    assert data.endswith(b"END")
+    assert b"bytes truncated" in data
+    assert len(data) < MAX_TICK_LOG_BYTES + 100
+    assert data[-TAIL_BYTES:].count(b"x") == TAIL_BYTES - 3
+
+
+def test_rotate_tick_logs(tmp_path):
+    """
+    Test that rotation keeps only the newest ticks.
+    """
+    for minute in range(5):
+        write_tick(tmp_path, f"t{minute}", [b"out"], datetime(2025, 4, 5, 12, minute))
+
+    rotate_tick_logs("ledger1", keep=2, log_dir=str(tmp_path))
+
+    assert [tick["tick_id"] for tick in list_tick_logs("ledger1", log_dir=str(tmp_path))] == ["t3", "t4"]
+
+
+@patch("app.lookup_ledger", return_value=MagicMock())
+def test_ledger_logs_endpoint_latest_tail(mock_lookup, client, tmp_path):
+    """
+    Test that /ledger_logs returns the tail of the latest tick.
+    """
+    write_tick(tmp_path, "old", [b"old output"], datetime(2025, 4, 5, 12, 0))
+    write_tick(tmp_path, "new", [b"new output"], datetime(2025, 4, 5, 12, 5))
+
+    with patch("app.list_tick_logs", lambda name: list_tick_logs(name, log_dir=str(tmp_path))), \
+            patch("app.read_tick_log", lambda name, tick_id, **kwargs: read_tick_log(name, tick_id, log_dir=str(tmp_path), **kwargs)):
+        listing = client.get("/ledger_logs?name=ledger1")
+        response = client.get("/ledger_logs?name=ledger1&tick_id=latest&tail=6")
+
+    assert [tick["tick_id"] for tick in listing.json["ticks"]] == ["old", "new"]
+    assert response.status_code == 200
+    assert response.json["tick_id"] == "new"
+    assert response.json["data"] == "output"
+
+
+def test_ledger_logs_requires_api_key(client):
+    """
+    Test that /ledger_logs rejects requests without a valid API key.
+    """
+    with patch("app.validate_api_key", return_value=False):
+        response = client.get("/ledger_logs?name=ledger1")
+
+    assert response.status_code == 401
+
+
+@patch("utils.docker_utils.get_docker_client")
+def test_stream_container_removes_stale_container(mock_client):
+    """
+    Test that a container left behind by a killed tick is removed before the next one is started under its name.
+    """
+    stale = MagicMock()
+    mock_client.return_value.containers.get.return_value = stale
+    container = mock_client.return_value.containers.run.return_value
+    container.logs.return_value = []
+    container.wait.return_value = {"StatusCode": 0}
+    container.stats.return_value = []
+
+    stream_docker_container("img", MagicMock(), container_name="ledger-demo")
+
+    mock_client.return_value.containers.get.assert_called_once_with("ledger-demo")
+    stale.remove.assert_called_once_with(force=True)
+    mock_client.return_value.containers.run.assert_called_once()
+
+
+@patch("utils.docker_utils.get_docker_client")
+def test_stream_container_without_stale_container(mock_client):
+    """
+    Test that a missing container of the same name does not stop a tick from starting.
+    """
+    mock_client.return_value.containers.get.side_effect = docker.errors.NotFound("gone")
+    container = mock_client.return_value.containers.run.return_value
+    container.logs.return_value = []
+    container.wait.return_value = {"StatusCode": 0}
+    container.stats.return_value = []
+
+    stream_docker_container("img", MagicMock(), container_name="ledger-demo")
+
+    mock_client.return_value.containers.run.assert_called_once()
@@ -0,0 +1,121 @@
+from unittest.mock import patch, MagicMock
+from utils.ledger_registry import LedgerInfo
+
+
+def _row(name):
+    row = MagicMock()
+    row.name = name
+    row.tickers_to_track = ["AAPL"]
+    row.algo_link = "link"
+    row.update_time = 5
+    row.end_duration = 7
+    row.status = "created"
+    row.start_time = None
+    return row
+
+
+@patch('utils.ledger_registry.start_registry_listener')
+@patch('utils.ledger_registry.get_db_connection')
+def test_load_registry_bulk(mock_get_db_connection, mock_listener, ledger_registry):
+    """Loading reads every ledger in one query and subscribes for invalidations"""
+    mock_conn = MagicMock()
+    mock_get_db_connection.return_value.__enter__.return_value = mock_conn
+    mock_conn.execute.return_value.fetchall.return_value = [_row("a"), _row("b")]
+
+    ledger_registry.load_registry()
+
+    assert set(ledger_registry._registry) == {"a", "b"}
+    assert ledger_registry._registry["a"].update_time == 5
+    mock_conn.execute.assert_called_once()
+    mock_listener.assert_called_once()
+
+
+@patch('utils.ledger_registry.get_db_connection')
+def test_lookup_hit_skips_db(mock_get_db_connection, ledger_registry):
+    ledger_registry.register_ledger(LedgerInfo("a", ["AAPL"], "link", 5, 7, "created", None))
+
+    assert ledger_registry.lookup_ledger("a").end_duration == 7
+    mock_get_db_connection.assert_not_called()
+
+
+def test_lookup_miss_falls_through(ledger_registry):
+    """A miss queries the given connection and caches a positive result"""
+    mock_conn = MagicMock()
+    mock_conn.execute.return_value.fetchone.side_effect = [_row("a"), None]
+
+    assert ledger_registry.lookup_ledger("a", mock_conn).name == "a"
+    assert ledger_registry.lookup_ledger("a", mock_conn).name == "a"
+    assert ledger_registry.lookup_ledger("missing", mock_conn) is None
+    assert mock_conn.execute.call_count == 2
+
+
+def test_invalidation_drops_entry(ledger_registry):
+    ledger_registry.register_ledger(LedgerInfo("a", ["AAPL"], "link", 5, 7, "created", None))
+
+    ledger_registry._handle_invalidation({"data": b'{"name": "a"}'})
+
+    assert "a" not in ledger_registry._registry
+
+
+def test_invalidation_during_miss_is_not_lost(ledger_registry):
+    """A row read before an invalidation arrived is returned but not cached"""
+    mock_conn = MagicMock()
+
+    def fetchone():
+        ledger_registry._handle_invalidation({"data": b'{"name": "a"}'})
+        return _row("a")
+
+    mock_conn.execute.return_value.fetchone.side_effect = fetchone
+
+    assert ledger_registry.lookup_ledger("a", mock_conn).name == "a"
+    assert "a" not in ledger_registry._registry
+
+
+@patch('utils.ledger_registry.start_registry_listener')
+@patch('utils.ledger_registry.get_db_connection')
+def test_invalidation_during_load_is_not_lost(mock_get_db_connection, mock_listener, ledger_registry):
+    """Entries invalidated while the registry loads are left out of it"""
+    mock_conn = MagicMock()
+    mock_get_db_connection.return_value.__enter__.return_value = mock_conn
+
+    def fetchall():
+        ledger_registry._handle_invalidation({"data": b'{"name": "a"}'})
+        return [_row("a"), _row("b")]
+
+    mock_conn.execute.return_value.fetchall.side_effect = fetchall
+
+    ledger_registry.load_registry()
+
+    assert set(ledger_registry._registry) == {"b"}
+    assert ledger_registry._loaded
+
+
+def test_lookup_without_listener_bypasses_registry(mock_redis, ledger_registry):
+    """Cached entries are not trusted while the invalidation subscription is down"""
+    ledger_registry.register_ledger(LedgerInfo("a", ["AAPL"], "link", 5, 7, "running", None))
+    ledger_registry._listener = None
+    mock_redis.pubsub.side_effect = ConnectionError("redis went away")
+    mock_conn = MagicMock()
+    row = _row("a")
+    row.status = "paused"
+    mock_conn.execute.return_value.fetchone.return_value = row
+
+    assert ledger_registry.lookup_ledger("a", mock_conn).status == "paused"
+    assert ledger_registry.lookup_ledger("a", mock_conn).status == "paused"
+    # the subscription is retried at most every LISTENER_RETRY_SECONDS
+    mock_redis.pubsub.assert_called_once()
+    assert mock_conn.execute.call_count == 2
+
+
+def test_resubscribing_drops_cached_entries(mock_redis, ledger_registry):
+    """Entries cached before the subscription was lost are dropped once it is back"""
+    ledger_registry.register_ledger(LedgerInfo("a", ["AAPL"], "link", 5, 7, "running", None))
+    ledger_registry._listener = None
+    mock_conn = MagicMock()
+    mock_conn.execute.return_value.fetchone.return_value = _row("a")
+
+    with patch('utils.ledger_registry.load_registry') as mock_load:
+        assert ledger_registry.lookup_ledger("a", mock_conn).status == "created"
+
+    mock_load.assert_called_once()
+    assert ledger_registry._listener is not None
@@ -0,0 +1,42 @@
+import json
+from unittest.mock import patch
+from utils.ledger_events import publish_ledger_update, stream_ledger_updates
+from utils.ledger_registry import LedgerInfo
+
+
+def test_publish_ledger_update(mock_redis):
+    publish_ledger_update("demo", "2025-01-01 00:00:00", [], {"AAPL": 1}, 100, 250)
+
+    channel, payload = mock_redis.pipeline.return_value.publish.call_args[0]
+    assert channel == "ledger-updates:demo"
+    assert json.loads(payload)["holding"] == {"AAPL": 1}
+
+
+def test_stream_ledger_updates(mock_redis):
+    """Messages become update events, quiet periods become heartbeats"""
+    pubsub = mock_redis.pubsub.return_value
+    pubsub.get_message.side_effect = [None, {"data": b'{"balance": 100}'}]
+
+    stream = stream_ledger_updates("demo")
+    events = [next(stream) for _ in range(3)]
+    stream.close()
+
+    pubsub.subscribe.assert_called_once_with("ledger-updates:demo")
+    assert events[1] == ": heartbeat\n\n"
+    assert events[2] == 'event: update\ndata: {"balance": 100}\n\n'
+    pubsub.close.assert_called_once()
+
+
+@patch("app.lookup_ledger", return_value=None)
+def test_ledger_stream_missing_ledger(mock_lookup, client):
+    response = client.get("/ledger_stream?name=missing")
+    assert response.status_code == 404
+
+
+def test_ledger_stream_endpoint(client, ledger_registry):
+    ledger_registry.register_ledger(LedgerInfo("demo", ["AAPL"], "link", 5, 7, "running", None))
+    with patch("app.stream_ledger_updates", return_value=iter([": streaming\n\n"])):
+        response = client.get("/ledger_stream?name=demo")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
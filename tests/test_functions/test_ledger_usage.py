@@ -0,0 +1,95 @@
+from datetime import date
+from unittest.mock import patch, MagicMock
+
+import utils.redis_utils
+from utils.docker_utils import stream_docker_container
+from utils.ledger_usage import profile_update, record_usage, update_writes, usage_report
+
+
+def test_record_usage_increments_daily_hash():
+    """
+    Test that usage is added to today's hash, one field per ledger and metric, skipping zeros.
+    """
+    pipeline = utils.redis_utils._redis_client.pipeline.return_value
+    record_usage("demo", ticks=1, tick_errors=0, tick_seconds=2.5)
+
+    fields = [call.args[1:] for call in pipeline.hincrbyfloat.call_args_list]
+    assert fields == [("demo:ticks", 1), ("demo:tick_seconds", 2.5)]
+    pipeline.execute.assert_called_once()
+
+
+def test_update_writes():
+    """
+    Test the rows counted for an update: trades, value point, ledger row and applied tick.
+    """
+    writes = update_writes([{"ticker": "AAPL"}, {"ticker": "GOOG"}], {"AAPL": 1}, tick_id="t1")
+    assert writes["db_rows"] == 5
+    assert writes["db_bytes"] > 0
+
+
+def test_usage_report_sums_days_and_ranks():
+    """
+    Test that the report sums each ledger's usage over the requested days and ranks ledgers by the sort metric.
+    """
+    pipeline = utils.redis_utils._redis_client.pipeline.return_value
+    pipeline.execute.return_value = [
+        {b"a:ticks": b"2", b"a:tick_seconds": b"10", b"b:ticks": b"1", b"b:tick_seconds": b"30"},
+        {b"a:ticks": b"2", b"a:tick_seconds": b"10", b"we:ird:updates": b"1"},
+    ]
+
+    report = usage_report(days=2, sort="tick_seconds", today=date(2026, 10, 19))
+
+    assert [usage["name"] for usage in report] == ["b", "a", "we:ird"]
+    assert report[1]["ticks"] == 4
+    assert report[1]["mean_tick_seconds"] == 5
+    assert report[2]["updates"] == 1
+    assert report[2]["mean_tick_seconds"] is None
+    assert [call.args[0] for call in pipeline.hgetall.call_args_list] == [
+        "ledger-usage:2026-10-19", "ledger-usage:2026-10-18"
+    ]
+
+
+@patch("app.usage_report", return_value=[{"name": "demo", "ticks": 3.0}])
+def test_ledger_usage_endpoint(mock_report, client):
+    """
+    Test the /ledger_usage report and its argument validation.
+    """
+    response = client.get("/ledger_usage?days=7&sort=cpu_seconds")
+    assert response.status_code == 200
+    assert response.json == {"days": 7, "ledgers": [{"name": "demo", "ticks": 3.0}]}
+    mock_report.assert_called_once_with(7, None, "cpu_seconds", 20)
+
+    assert client.get("/ledger_usage?sort=bogus").status_code == 400
+    assert client.get("/ledger_usage?days=0").status_code == 400
+
+
+def test_profile_update_saves_sampled_profile(tmp_path):
+    """
+    Test that a sampled update is profiled into the profile directory, with the ledger name made path-safe.
+    """
+    with patch("utils.ledger_usage.PROFILE_SAMPLE_RATE", 1.0), patch("utils.ledger_usage.PROFILE_DIR", str(tmp_path)):
+        with profile_update("../demo"):
+            sum(range(1000))
+
+    profiles = list(tmp_path.iterdir())
+    assert len(profiles) == 1
+    assert profiles[0].name.startswith("update-.._demo-")
+
+
+@patch("utils.docker_utils.get_docker_client")
+def test_stream_container_samples_stats(mock_client):
+    """
+    Test that running a container reports its CPU time and peak memory from the stats stream.
+    """
+    container = mock_client.return_value.containers.run.return_value
+    container.logs.return_value = [b"out"]
+    container.wait.return_value = {"StatusCode": 0}
+    container.stats.return_value = [
+        {"cpu_stats": {"cpu_usage": {"total_usage": 1_000_000_000}}, "memory_stats": {"usage": 300}},
+        {"cpu_stats": {"cpu_usage": {"total_usage": 2_500_000_000}}, "memory_stats": {"usage": 200}},
+    ]
+
+    usage = stream_docker_container("img", MagicMock(), container_name="ledger-demo")
+
+    assert usage == {"cpu_seconds": 2.5, "memory_peak_bytes": 300}
+    container.remove.assert_called_once_with(force=True)
@@ -1,6 +1,6 @@
 import pytest
 from unittest.mock import patch, MagicMock
-from utils.ledger_utils import calculate_new_balance, get_current_price, calculate_total_value
+from utils.ledger_utils import calculate_new_balance, get_current_price, get_current_prices, calculate_total_value
 
 def test_standard_case_calculate_new_balance():
     """Test calculate_new_balance for the expected use case"""
@@ -128,4 +128,28 @@ def test_calculate_total_value_error_handling(mock_get_current_price):
         calculate_total_value(holdings, balance)
 
     mock_get_current_price.assert_any_call("AAPL")
-    mock_get_current_price.assert_any_call("ERROR_TICKER")
\ No newline at end of file
+    mock_get_current_price.assert_any_call("ERROR_TICKER")
+
+
+@patch('utils.ledger_utils.get_current_price')
+def test_calculate_total_value_uses_given_prices(mock_get_price):
+    """Prices from a quote snapshot are used instead of fetching them"""
+    mock_get_price.return_value = 50
+
+    total_value = calculate_total_value({"AAPL": 2, "GOOG": 1}, 100, prices={"AAPL": 10})
+
+    mock_get_price.assert_called_once_with("GOOG")
+    assert total_value == 170
+
+
+@patch('utils.ledger_utils.yf.download')
+def test_get_current_prices_single_request(mock_download):
+    """All tickers are fetched in one download and the latest close of each is used"""
+    import pandas as pd
+    columns = pd.MultiIndex.from_product([["Close"], ["AAPL", "GOOG"]])
+    mock_download.return_value = pd.DataFrame([[170.0, 100.0], [171.0, float("nan")]], columns=columns)
+
+    prices = get_current_prices(["AAPL", "GOOG"])
+
+    mock_download.assert_called_once()
+    assert prices == {"AAPL": 171.0, "GOOG": 100.0}
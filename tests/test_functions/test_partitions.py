@@ -0,0 +1,163 @@
+from datetime import datetime, timezone
+from unittest.mock import patch, MagicMock
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from utils import partitions
+from utils.ledger_store import append_ledger_update, purge_ledger_history
+
+
+def _statements(mock_conn):
+    return [str(call[0][0]) for call in mock_conn.execute.call_args_list]
+
+
+@pytest.fixture
+def conn():
+    """A real connection, so transaction events fire, whose execute is mocked out."""
+    with create_engine("sqlite://").connect() as conn:
+        conn.begin()
+        with patch.object(conn, "execute"):
+            yield conn
+    partitions._created.clear()
+
+
+def test_ensure_partitions_creates_monthly_partitions_once(conn):
+    partitions._created.clear()
+    ts = datetime(2025, 12, 15, tzinfo=timezone.utc)
+
+    partitions.ensure_partitions(conn, ts)
+    conn.commit()
+    partitions.ensure_partitions(conn, ts)
+
+    statements = _statements(conn)
+    assert len(statements) == 2
+    assert "ledger_trades_2025_12 PARTITION OF ledger_trades" in statements[0]
+    assert "FROM ('2025-12-01T00:00:00+00:00') TO ('2026-01-01T00:00:00+00:00')" in statements[0]
+    assert "ledger_values_2025_12 PARTITION OF ledger_values" in statements[1]
+
+
+def test_ensure_partitions_forgets_rolled_back_partitions(conn):
+    """Partitions created in a rolled-back transaction are created again by the next one"""
+    partitions._created.clear()
+    ts = datetime(2025, 12, 15, tzinfo=timezone.utc)
+
+    partitions.ensure_partitions(conn, ts)
+    conn.rollback()
+    conn.begin()
+    partitions.ensure_partitions(conn, ts)
+    conn.commit()
+
+    assert len(_statements(conn)) == 4
+    assert partitions._created == {"ledger_trades_2025_12", "ledger_values_2025_12"}
+
+
+@patch("utils.partitions.LEDGER_HASH_PARTITIONS", 4)
+def test_ensure_partitions_hash_subpartitions(conn):
+    partitions._created.clear()
+
+    partitions.ensure_partitions(conn, datetime(2025, 1, 1, tzinfo=timezone.utc))
+
+    statements = _statements(conn)
+    assert "PARTITION BY HASH (ledger_name)" in statements[0]
+    assert "MODULUS 4, REMAINDER 3" in statements[4]
+
+
+@pytest.fixture(autouse=True)
+def pyarrow_installed():
+    with patch("utils.partitions.pyarrow", MagicMock()):
+        yield
+
+
+@patch("utils.partitions.pyarrow", None)
+@patch("utils.partitions.list_partitions")
+def test_archive_partitions_without_pyarrow_keeps_partitions(mock_list):
+    mock_conn = MagicMock()
+
+    assert partitions.archive_partitions(mock_conn, datetime(2025, 2, 1, tzinfo=timezone.utc), "archive") == []
+    mock_list.assert_not_called()
+    mock_conn.execute.assert_not_called()
+
+
+@patch("utils.partitions.export_partition")
+@patch("utils.partitions.list_partitions")
+def test_archive_partitions_exports_before_detaching(mock_list, mock_export):
+    mock_list.side_effect = lambda conn, table: [f"{table}_2025_01", f"{table}_2025_02"]
+    mock_export.side_effect = lambda conn, table, name, archive_dir: (f"{archive_dir}/{name}.parquet", 3)
+    mock_conn = MagicMock()
+    mock_conn.execute.return_value.scalar.return_value = 3
+
+    archived = partitions.archive_partitions(mock_conn, datetime(2025, 2, 1, tzinfo=timezone.utc), "archive")
+
+    assert archived == ["archive/ledger_trades_2025_01.parquet", "archive/ledger_values_2025_01.parquet"]
+    assert mock_export.call_count == 2
+    statements = _statements(mock_conn)
+    detach = statements.index("ALTER TABLE ledger_trades DETACH PARTITION ledger_trades_2025_01")
+    assert statements[detach - 1] == "SET LOCAL lock_timeout = '5s'"
+    assert "DROP TABLE ledger_trades_2025_01" in statements
+    assert not any("2025_02" in statement for statement in statements)
+
+
+@patch("utils.partitions.export_partition")
+@patch("utils.partitions.list_partitions")
+def test_archive_partitions_reexports_rows_added_before_detach(mock_list, mock_export):
+    mock_list.side_effect = lambda conn, table: [f"{table}_2025_01"] if table == "ledger_values" else []
+    mock_export.side_effect = [("archive/ledger_values_2025_01.parquet", 3), ("archive/ledger_values_2025_01.parquet", 4)]
+    mock_conn = MagicMock()
+    mock_conn.execute.return_value.scalar.return_value = 4
+
+    partitions.archive_partitions(mock_conn, datetime(2025, 2, 1, tzinfo=timezone.utc), "archive")
+
+    assert mock_export.call_count == 2
+    assert "DROP TABLE ledger_values_2025_01" in _statements(mock_conn)
+
+
+@patch("utils.partitions.export_partition", return_value=("archive/ledger_values_2025_01.parquet", 3))
+@patch("utils.partitions.list_partitions")
+def test_archive_partitions_leaves_locked_partition(mock_list, mock_export):
+    mock_list.side_effect = lambda conn, table: [f"{table}_2025_01"] if table == "ledger_values" else []
+    mock_conn = MagicMock()
+
+    def execute(statement, *args):
+        if "DETACH" in str(statement):
+            raise OperationalError(str(statement), {}, Exception("canceling statement due to lock timeout"))
+        return MagicMock()
+
+    mock_conn.execute.side_effect = execute
+
+    assert partitions.archive_partitions(mock_conn, datetime(2025, 2, 1, tzinfo=timezone.utc), "archive") == []
+    mock_conn.rollback.assert_called_once()
+    assert not any("DROP" in statement for statement in _statements(mock_conn))
+
+
+@patch("utils.ledger_store.ensure_partitions")
+def test_append_ledger_update_inserts_history_rows(mock_ensure):
+    mock_conn = MagicMock()
+    ts = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    trades = [{"type": "buy", "ticker": "AAPL", "price": 1, "quantity": 1}] * 2
+
+    append_ledger_update(mock_conn, "demo", ts, trades, {"AAPL": 2}, 98, 100, "tick-1")
+
+    mock_ensure.assert_called_once_with(mock_conn, ts)
+    trade_rows = mock_conn.execute.call_args_list[0][0][1]
+    assert len(trade_rows) == 2
+    assert trade_rows[0]["tick_id"] == "tick-1"
+    # trades, value point and the ledger row itself
+    assert mock_conn.execute.call_count == 3
+
+
+def test_purge_ledger_history_deletes_in_batches():
+    mock_conn = MagicMock()
+    # trades take two full batches and a partial one, values a single partial batch
+    mock_conn.execute.side_effect = [MagicMock(rowcount=count) for count in (2, 2, 1, 0)]
+
+    purged = purge_ledger_history(mock_conn, "demo", datetime(2025, 1, 1, tzinfo=timezone.utc), batch_rows=2)
+
+    assert purged == 5
+    assert mock_conn.execute.call_count == 4
+    assert mock_conn.commit.call_count == 4
+    statements = _statements(mock_conn)
+    assert statements[0].startswith("DELETE FROM ledger_trades")
+    assert "LIMIT" in statements[0]
+    assert statements[3].startswith("DELETE FROM ledger_values")
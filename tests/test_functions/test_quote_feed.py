@@ -0,0 +1,90 @@
+import json
+import socket
+from datetime import datetime, timezone
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from utils.quote_feed import QuoteFeed, SyntheticProvider, YFinanceProvider, get_provider, tracked_tickers
+
+
+def test_synthetic_provider_is_deterministic():
+    """
+    Test that the synthetic feed gives the same walk for the same seed.
+    """
+    first, second = SyntheticProvider(seed=1), SyntheticProvider(seed=1)
+    for _ in range(3):
+        assert first.fetch(["AAPL", "GOOG"]) == second.fetch(["AAPL", "GOOG"])
+    assert get_provider("synthetic").market_hours_only is False
+    with pytest.raises(ValueError):
+        get_provider("bloomberg")
+
+
+@patch("utils.quote_feed.node_for_ledger")
+@patch("utils.quote_feed.get_db_connection")
+def test_tracked_tickers_union(mock_get_db_connection, mock_node):
+    """
+    Test that the feed tracks the union of tickers of the running ledgers owned by its node.
+    """
+    conn = mock_get_db_connection.return_value.__enter__.return_value
+    conn.execute.return_value.fetchall.return_value = [
+        MagicMock(tickers_to_track=["AAPL", "GOOG"]),
+        MagicMock(tickers_to_track=["GOOG", "MSFT", ""]),
+        MagicMock(tickers_to_track=["TSLA"]),
+    ]
+    mock_node.side_effect = ["node-a", "node-a", "node-b"]
+
+    assert tracked_tickers("node-a") == ["AAPL", "GOOG", "MSFT"]
+    mock_get_db_connection.assert_called_once_with(readonly=True)
+
+
+def read_snapshot(client):
+    data = b""
+    while not data.endswith(b"\n"):
+        data += client.recv(4096)
+    return json.loads(data)
+
+
+@patch("utils.quote_feed.tracked_tickers", return_value=["AAPL", "GOOG"])
+def test_feed_fans_out_over_socket(mock_tickers, tmp_path):
+    """
+    Test that subscribers get the latest snapshot on connect and new ones as they are polled,
+    filtered to the tickers they asked for.
+    """
+    feed = QuoteFeed(SyntheticProvider(seed=1), socket_path=str(tmp_path / "quotes.sock"))
+    feed.start()
+    try:
+        first = feed.poll(now=datetime(2026, 10, 19, 14, 30, tzinfo=timezone.utc))
+
+        everything = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        everything.connect(feed.socket_path)
+        everything.sendall(b"\n")
+        only_aapl = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        only_aapl.connect(feed.socket_path)
+        only_aapl.sendall(b"AAPL\n")
+
+        assert read_snapshot(everything)["quotes"] == first
+        assert read_snapshot(only_aapl)["quotes"] == {"AAPL": first["AAPL"]}
+
+        second = feed.poll(now=datetime(2026, 10, 19, 14, 31, tzinfo=timezone.utc))
+        snapshot = read_snapshot(only_aapl)
+        assert snapshot == {"timestamp": "2026-10-19T14:31:00+00:00", "quotes": {"AAPL": second["AAPL"]}}
+        assert read_snapshot(everything)["quotes"] == second
+
+        everything.close()
+        only_aapl.close()
+    finally:
+        feed.close()
+
+
+@patch("utils.quote_feed.is_market_open", return_value=False)
+def test_feed_polls_once_while_market_closed(mock_open):
+    """
+    Test that a feed started while the market is closed still fetches one snapshot for its subscribers.
+    """
+    feed = QuoteFeed(YFinanceProvider())
+    now = datetime(2026, 10, 17, 3, 0, tzinfo=timezone.utc)
+
+    assert feed._should_poll(now)
+    feed.publish(now, {"AAPL": 187.1})
+    assert not feed._should_poll(now)
@@ -1,16 +1,18 @@
 # test_scheduling.py
 from datetime import datetime, timedelta
 from unittest.mock import patch, MagicMock
-from utils.tasks import run_ledger_trade, execute_trade_cycle
+from utils.tasks import run_ledger_trade, execute_trade_cycle, release_ledger, stop_ledger_container
 
 # test 1: call execute_trade_cycle with correct arguments
-@patch("utils.tasks.execute_trade_cycle")
-def test_run_ledger_trade_starts_cycle(mock_execute):
+@patch("utils.tasks.schedule_for_ledger")
+def test_run_ledger_trade_starts_cycle(mock_schedule):
     result = run_ledger_trade.call_local("ledger1", "/img1", 15, 2)
 
     # assert that result was called with exepected args
-    mock_execute.assert_called_once()
-    args = mock_execute.call_args[0]
+    mock_schedule.assert_called_once()
+    task, name, args = mock_schedule.call_args[0]
+    assert task is execute_trade_cycle
+    assert name == "ledger1"
     assert args[0] == "ledger1"
     assert args[1] == "/img1"
     assert args[2] == 15
@@ -20,12 +22,15 @@ def test_run_ledger_trade_starts_cycle(mock_execute):
     assert result["success"] is True
 
 
-# test 2: calls docker and schedules the next run
-@patch("utils.tasks.execute_trade_cycle.schedule", create=True)
-@patch("utils.tasks.run_docker_container")
-@patch("utils.tasks.get_db_connection")
+# test 2: calls docker, logs the tick and schedules the next run
+@patch("utils.tasks.record_tick")
+@patch("utils.tasks.ensure_docker_image")
+@patch("utils.tasks.schedule_for_ledger")
+@patch("utils.tasks.TickLogWriter")
+@patch("utils.tasks.stream_docker_container")
+@patch("utils.tasks.lookup_ledger")
 @patch("utils.tasks.datetime")
-def test_execute_trade_cycle_schedules_next(mock_datetime, mock_db, mock_docker, mock_schedule):
+def test_execute_trade_cycle_schedules_next(mock_datetime, mock_lookup, mock_docker, mock_log, mock_schedule, mock_image, mock_record):
     # simulated current time
     now = datetime(2025, 4, 5, 12, 0)
     # override the curent datetime for testing
@@ -33,23 +38,55 @@ def test_execute_trade_cycle_schedules_next(mock_datetime, mock_db, mock_docker,
     # forward all arguments to the real datetime constructor to preserve normal behavior when mocking
     mock_datetime.side_effect = lambda *args, **kwargs: datetime(*args, **kwargs)
 
-    # mock db connection and response
-    mock_conn = MagicMock()
-    mock_conn.execute.return_value.fetchone.return_value = ("ledger1",)
-    mock_db.return_value.__enter__.return_value = mock_conn
-    mock_docker.return_value = b"docker logs"
+    # mock registry response
+    mock_lookup.return_value = MagicMock(status="running")
+    mock_docker.return_value = {"cpu_seconds": 1.5, "memory_peak_bytes": 1024}
 
     # simulate ledger that started trading 5 mins ago
     start_time = now - timedelta(minutes=5)
-    execute_trade_cycle.call_local("ledger1", "/img", 10, 1, start_time)
+    with patch("utils.tasks.record_usage") as mock_usage:
+        execute_trade_cycle.call_local("ledger1", "/img", 10, 1, start_time)
+
+    # the tick's cost is accounted to the ledger
+    usage = mock_usage.call_args.kwargs
+    assert usage["ticks"] == 1 and usage["tick_errors"] == 0
+    assert usage["cpu_seconds"] == 1.5 and usage["memory_peak_bytes"] == 1024
 
-    mock_docker.assert_called_once_with(image_name="/img", command=None)
+    mock_docker.assert_called_once()
+    assert mock_docker.call_args.kwargs["image_name"] == "/img"
+    assert mock_docker.call_args.kwargs["container_name"] == "ledger-ledger1"
+    # the tick id handed to the container is the one recorded in the tick log
+    tick_id = mock_docker.call_args.kwargs["environment"]["LEDGER_TICK_ID"]
+    mock_record.assert_called_once_with("ledger1", tick_id, now, "ok")
+    # the container output is streamed into the tick's log file
+    mock_log.assert_called_once_with("ledger1", tick_id, now)
+    assert mock_docker.call_args.kwargs["output"] is mock_log.return_value.__enter__.return_value
     mock_schedule.assert_called_once()
 
 
-# test 3: execute_trade_cycle exits if we're past the end time
+# test: the tick id comes from the task, so a re-executed tick reuses it and update_ledger drops its repeated updates
+@patch("utils.tasks.record_usage")
+@patch("utils.tasks.record_tick")
+@patch("utils.tasks.ensure_docker_image")
+@patch("utils.tasks.schedule_for_ledger")
+@patch("utils.tasks.TickLogWriter")
+@patch("utils.tasks.stream_docker_container", return_value={})
+@patch("utils.tasks.lookup_ledger")
+def test_execute_trade_cycle_tick_id_is_stable(mock_lookup, mock_docker, mock_log, mock_schedule, mock_image, mock_record, mock_usage):
+    mock_lookup.return_value = MagicMock(status="running")
+    task = MagicMock(id="3f2a9c1e-0b7d-4c1a-9e55-2d6f0a8b7c31")
+
+    for _ in range(2):
+        execute_trade_cycle.call_local("ledger1", "/img", 10, 1, datetime.now(), task=task)
+
+    tick_ids = [call.kwargs["environment"]["LEDGER_TICK_ID"] for call in mock_docker.call_args_list]
+    assert tick_ids == ["3f2a9c1e0b7d4c1a9e552d6f0a8b7c31"] * 2
+
+
+# test 3: execute_trade_cycle exits and marks the ledger stopped if we're past the end time
+@patch("utils.tasks.transition_ledger")
 @patch("utils.tasks.datetime")
-def test_execute_trade_cycle_past_end_time(mock_datetime):
+def test_execute_trade_cycle_past_end_time(mock_datetime, mock_transition):
     now = datetime(2025, 4, 5, 12, 0)
     mock_datetime.now.return_value = now
     # forward all arguments to the real datetime constructor to preserve normal behavior when mocking
@@ -57,4 +94,80 @@ def test_execute_trade_cycle_past_end_time(mock_datetime):
 
     start_time = datetime(2000, 1, 1)
     result = execute_trade_cycle.call_local("ledger1", "image", 10, 1, start_time)
-    assert result is None
\ No newline at end of file
+    assert result is None
+    mock_transition.assert_called_once_with("ledger1", {"running"}, "stopped")
+
+
+# test 4: execute_trade_cycle stops once the ledger is gone from the registry
+@patch("utils.tasks.ensure_docker_image")
+@patch("utils.tasks.schedule_for_ledger")
+@patch("utils.tasks.TickLogWriter")
+@patch("utils.tasks.stream_docker_container")
+@patch("utils.tasks.lookup_ledger")
+def test_execute_trade_cycle_deleted_ledger(mock_lookup, mock_docker, mock_log, mock_schedule, mock_image):
+    mock_lookup.return_value = None
+
+    execute_trade_cycle.call_local("ledger1", "/img", 10, 1, datetime.now())
+
+    mock_docker.assert_not_called()
+    mock_schedule.assert_not_called()
+
+
+# test 5: a ledger paused while its container ran is not rescheduled
+@patch("utils.tasks.record_tick")
+@patch("utils.tasks.ensure_docker_image")
+@patch("utils.tasks.schedule_for_ledger")
+@patch("utils.tasks.TickLogWriter")
+@patch("utils.tasks.stream_docker_container")
+@patch("utils.tasks.lookup_ledger")
+def test_execute_trade_cycle_paused_during_run(mock_lookup, mock_docker, mock_log, mock_schedule, mock_image, mock_record):
+    mock_lookup.side_effect = [MagicMock(status="running"), MagicMock(status="paused")]
+
+    execute_trade_cycle.call_local("ledger1", "/img", 10, 1, datetime.now())
+
+    mock_docker.assert_called_once()
+    mock_schedule.assert_not_called()
+
+
+# test 6: a failed container run is recorded in the tick log and the cycle continues
+@patch("utils.tasks.record_tick")
+@patch("utils.tasks.ensure_docker_image")
+@patch("utils.tasks.schedule_for_ledger")
+@patch("utils.tasks.TickLogWriter")
+@patch("utils.tasks.stream_docker_container")
+@patch("utils.tasks.lookup_ledger")
+def test_execute_trade_cycle_records_error(mock_lookup, mock_docker, mock_log, mock_schedule, mock_image, mock_record):
+    mock_lookup.return_value = MagicMock(status="running")
+    mock_docker.side_effect = RuntimeError("boom")
+
+    execute_trade_cycle.call_local("ledger1", "/img", 10, 1, datetime.now())
+
+    assert mock_record.call_args[0][3] == "error"
+    assert mock_record.call_args[0][4] == "boom"
+    mock_schedule.assert_called_once()
+
+
+# test: releasing a ledger happens after its status is committed, so it never raises
+@patch("utils.tasks.schedule_for_ledger", side_effect=ConnectionError("redis went away"))
+@patch("utils.tasks.revoke_next_task", side_effect=ConnectionError("redis went away"))
+def test_release_ledger_logs_failures(mock_revoke, mock_schedule):
+    release_ledger("ledger1")
+
+    mock_revoke.assert_called_once_with("ledger1")
+    mock_schedule.assert_called_once()
+
+
+# test: the container is stopped by the node that runs it, not by the calling process
+@patch("utils.tasks.schedule_for_ledger")
+@patch("utils.tasks.revoke_next_task")
+def test_release_ledger_stops_container_on_owner(mock_revoke, mock_schedule):
+    release_ledger("ledger1")
+
+    mock_schedule.assert_called_once_with(stop_ledger_container, "ledger1", ("ledger1",), pending=False)
+
+
+@patch("utils.tasks.stop_docker_container")
+def test_stop_ledger_container(mock_stop):
+    stop_ledger_container.call_local("ledger1")
+
+    mock_stop.assert_called_once_with("ledger-ledger1")
@@ -0,0 +1,26 @@
+import os
+import re
+
+from utils.db_config import metadata
+
+SCHEMA_FILE = os.path.join(os.path.dirname(__file__), "..", "..", "sql_statements", "initialization_stmts.sql")
+
+
+def test_sql_schema_matches_tables():
+    """
+    Test that the SQL initialization statements define every table and column of utils/db_config.py, and no others.
+    """
+    with open(SCHEMA_FILE) as schema_file:
+        sql = schema_file.read()
+
+    for table in metadata.tables.values():
+        create = re.search(rf"CREATE TABLE (?:IF NOT EXISTS )?{table.name} \((.*?)\n\)", sql, re.S)
+        assert create, f"{table.name} is not created"
+        columns = {
+            line.split()[0] for line in create.group(1).splitlines()
+            if line.strip() and not line.strip().startswith("PRIMARY KEY")
+        }
+        columns |= set(re.findall(rf"ALTER TABLE {table.name} ADD COLUMN (?:IF NOT EXISTS )?(\w+)", sql))
+        columns -= set(re.findall(rf"ALTER TABLE {table.name} DROP COLUMN (?:IF EXISTS )?(\w+)", sql))
+
+        assert columns == set(table.columns.keys()), table.name
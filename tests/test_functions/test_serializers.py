@@ -0,0 +1,52 @@
+import gzip
+import json
+import pytest
+from datetime import datetime
+from decimal import Decimal
+from flask import Flask
+from utils.json_utils import dumps_json
+from utils.serializers import serialize_response
+
+serializer_app = Flask(__name__)
+
+
+def test_dumps_json_decimal_and_datetime():
+    body = dumps_json({"balance": Decimal("100.5"), "at": datetime(2025, 1, 1, 12, 0)})
+    assert json.loads(body) == {"balance": "100.5", "at": "2025-01-01T12:00:00"}
+
+
+def test_serialize_response_defaults_to_json():
+    with serializer_app.test_request_context("/"):
+        response = serialize_response({"error": "Ledger not found"}, 404)
+
+    assert response.status_code == 404
+    assert response.mimetype == "application/json"
+    assert "Content-Encoding" not in response.headers
+
+
+def test_serialize_response_gzip_large_payload():
+    payload = {"value": {f"2025-01-01 00:00:{i:05d}": i for i in range(2000)}}
+    with serializer_app.test_request_context("/", headers={"Accept-Encoding": "gzip"}):
+        response = serialize_response(payload)
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(response.get_data()))["value"]["2025-01-01 00:00:00001"] == 1
+
+
+def test_serialize_response_msgpack():
+    msgpack = pytest.importorskip("msgpack")
+    with serializer_app.test_request_context("/", headers={"Accept": "application/msgpack"}):
+        response = serialize_response({"balance": Decimal("7")})
+
+    assert response.mimetype == "application/msgpack"
+    assert msgpack.unpackb(response.get_data()) == {"balance": "7"}
+
+
+def test_serialize_response_arrow_series():
+    pyarrow = pytest.importorskip("pyarrow")
+    accept = {"Accept": "application/vnd.apache.arrow.stream"}
+    with serializer_app.test_request_context("/", headers=accept):
+        response = serialize_response({"value": {"2025-01-01": 10, "2025-01-02": 11}}, series_key="value")
+
+    table = pyarrow.ipc.open_stream(response.get_data()).read_all()
+    assert table.column("value").to_pylist() == [10.0, 11.0]
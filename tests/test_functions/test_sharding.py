@@ -0,0 +1,131 @@
+import json
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from huey import MemoryHuey, crontab
+from utils import sharding, tasks
+from utils.sharding import HashRing
+
+
+def test_hash_ring_empty():
+    assert HashRing([]).node_for("ledger1") is None
+
+
+def test_hash_ring_node_join_moves_few_ledgers():
+    """Adding a node only moves ledgers onto the new node"""
+    ledgers = [f"ledger{i}" for i in range(1000)]
+    before = HashRing(["a", "b", "c"])
+    after = HashRing(["a", "b", "c", "d"])
+
+    moved = [name for name in ledgers if before.node_for(name) != after.node_for(name)]
+
+    assert all(after.node_for(name) == "d" for name in moved)
+    assert 100 < len(moved) < 400
+
+
+def test_node_for_ledger_uses_live_nodes(mock_redis):
+    mock_redis.zrangebyscore.return_value = [b"a", b"b"]
+
+    node = sharding.get_ring(refresh=True).node_for("ledger1")
+
+    assert node == HashRing(["a", "b"]).node_for("ledger1")
+    assert sharding.node_for_ledger("ledger1") == node
+
+
+@patch("utils.tasks.task_on_queue")
+@patch("utils.tasks.node_for_ledger", return_value="node-a")
+def test_schedule_for_ledger_routes_to_owner(mock_node, mock_task_on_queue, mock_redis):
+    mock_task_on_queue.return_value.return_value.id = "task-1"
+
+    tasks.schedule_for_ledger(tasks.run_ledger_trade, "ledger1", ("ledger1", "ledger1", 5, 1, None))
+
+    assert mock_task_on_queue.call_args[0] == (tasks.run_ledger_trade, "ledger-tasks-node-a")
+    key, value = mock_redis.set.call_args[0]
+    assert key == "ledger-next-task:ledger1"
+    assert json.loads(value) == {"queue": "ledger-tasks-node-a", "id": "task-1"}
+
+
+@pytest.fixture
+def memory_queues():
+    """Back every queue with an in-memory Huey so tasks can be inspected."""
+    tasks._queues.clear()
+    tasks._queue_tasks.clear()
+    with patch("utils.tasks.RedisHuey", side_effect=lambda name, **kwargs: MemoryHuey(name)):
+        yield
+    tasks._queues.clear()
+    tasks._queue_tasks.clear()
+
+
+@patch("utils.tasks.get_ring")
+@patch("utils.tasks.node_for_ledger", return_value="node-b")
+def test_migrate_queue(mock_node, mock_ring, mock_redis, memory_queues):
+    """Tasks on a departed node's queue move to their ledger's new owner, except revoked ones"""
+    mock_redis.get.return_value = None
+    eta = datetime.now() + timedelta(minutes=5)
+    departed = tasks.task_on_queue(tasks.execute_trade_cycle, "ledger-tasks-gone")
+    departed.schedule(args=("ledger1", "ledger1", 5, 1, datetime.now()), eta=eta)
+    revoked = departed.schedule(args=("ledger2", "ledger2", 5, 1, datetime.now()), eta=eta)
+    revoked.revoke()
+
+    tasks.migrate_queue("ledger-tasks-gone")
+
+    moved = tasks._huey_for_queue("ledger-tasks-node-b").pending()
+    assert [task.args[0] for task in moved] == ["ledger1"]
+    assert tasks._huey_for_queue("ledger-tasks-gone").pending() == []
+
+
+@patch("utils.tasks.get_ring")
+@patch("utils.tasks.node_for_ledger", return_value="node-b")
+def test_migrate_queue_drops_periodic_and_unreadable_tasks(mock_node, mock_ring, mock_redis, memory_queues):
+    """Periodic tasks and unreadable messages on a departed queue don't keep its trade cycles from moving"""
+    mock_redis.get.return_value = None
+    source = tasks._huey_for_queue("ledger-tasks-gone")
+    periodic = source.periodic_task(crontab(minute="*"))(tasks.take_over_departed_nodes.func)
+    source.enqueue(periodic.s())
+    source.storage.enqueue(b"not a task")
+    departed = tasks.task_on_queue(tasks.execute_trade_cycle, "ledger-tasks-gone")
+    departed("ledger1", "ledger1", 5, 1, datetime.now())
+
+    tasks.migrate_queue("ledger-tasks-gone")
+
+    moved = tasks._huey_for_queue("ledger-tasks-node-b").pending()
+    assert [task.args[0] for task in moved] == ["ledger1"]
+    assert source.storage.enqueued_items() == []
+
+
+@patch("utils.tasks.forget_node")
+@patch("utils.tasks.migrate_queue", side_effect=ConnectionError("redis went away"))
+@patch("utils.tasks.claim_departed_node", return_value=True)
+@patch("utils.tasks.departed_nodes", return_value=["gone"])
+@patch("utils.tasks.NODE_ID", "node-b")
+def test_failed_migration_keeps_departed_node(mock_departed, mock_claim, mock_migrate, mock_forget):
+    """A node is only forgotten once its queue has been moved, so a failed migration is retried"""
+    tasks.take_over_departed_nodes.call_local()
+
+    mock_claim.assert_called_once_with("gone", "node-b")
+    mock_forget.assert_not_called()
+
+
+def test_claim_departed_node(mock_redis):
+    mock_redis.set.return_value = True
+
+    assert sharding.claim_departed_node("gone", "node-b")
+    assert mock_redis.set.call_args[0] == ("ledger-worker-claim:gone", "node-b")
+    assert mock_redis.set.call_args[1] == {"nx": True, "ex": sharding.CLAIM_TTL_SECONDS}
+
+
+@patch("utils.tasks.threading.Thread")
+@patch("utils.tasks.heartbeat")
+@patch("utils.tasks.NODE_ID", "node-b")
+def test_join_ring_starts_one_heartbeat_thread(mock_heartbeat, mock_thread):
+    """Heartbeats come from a thread of their own, started once however many workers start up"""
+    tasks._heartbeat_thread = None
+    try:
+        tasks.join_ring()
+        tasks.join_ring()
+    finally:
+        tasks._heartbeat_thread = None
+
+    mock_heartbeat.assert_called_once_with("node-b")
+    mock_thread.assert_called_once_with(target=tasks._heartbeat_loop, args=("node-b",), daemon=True)
+    mock_thread.return_value.start.assert_called_once()
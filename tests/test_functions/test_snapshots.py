@@ -0,0 +1,171 @@
+import io
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock
+
+import pytest
+from psycopg2.errors import CheckViolation, UniqueViolation
+from sqlalchemy.exc import IntegrityError
+
+from utils.snapshots import decode_snapshot, encode_snapshot, restore_snapshot, snapshot_records
+
+EXECUTED_AT = datetime(2026, 9, 30, 14, 30, tzinfo=timezone.utc)
+RECORDED_AT = datetime(2026, 10, 1, 14, 30, tzinfo=timezone.utc)
+
+
+def source_connection():
+    """A connection holding ledger 'demo' with one legacy trade, one trade and one value point."""
+    conn = MagicMock()
+    conn.execution_options.return_value = conn
+    header = MagicMock()
+    header.fetchone.return_value = SimpleNamespace(
+        name="demo", tickers_to_track=["AAPL"], algo_link="link", update_time=5, end_duration=7,
+        image="localhost:5000/ledger-demo@sha256:abc123", created_at=datetime(2026, 1, 1),
+        holding={"AAPL": 10}, balance=Decimal("98500.25"),
+        trades=[{"ticker": "MSFT", "type": "buy"}], value={},
+    )
+    trades = MagicMock()
+    trades.partitions.return_value = [[(EXECUTED_AT, "t1", {"ticker": "AAPL", "type": "buy"})]]
+    values = MagicMock()
+    values.partitions.return_value = [[(RECORDED_AT, Decimal("100000.5"))]]
+    conn.execute.side_effect = [header, trades, values]
+    return conn
+
+
+def exported_records():
+    snapshot = b"".join(encode_snapshot(snapshot_records(source_connection(), "demo")))
+    return list(decode_snapshot(io.BytesIO(snapshot)))
+
+
+@patch("utils.snapshots.ensure_partitions")
+def test_snapshot_round_trip_fork(mock_partitions):
+    """
+    Test that an exported snapshot restores under a new name with its state and history.
+    """
+    records = exported_records()
+    assert records[0]["version"] == 1
+    assert records[-1] == {"end": {"trades": 1, "values": 1}}
+
+    conn = MagicMock()
+    info, counts = restore_snapshot(conn, records, "demo_fork")
+
+    assert counts == {"trades": 1, "values": 1}
+    assert info.name == "demo_fork"
+    assert info.status == "created"
+    assert info.image == "localhost:5000/ledger-demo@sha256:abc123"
+
+    statements = [call.args for call in conn.execute.call_args_list]
+    ledger_row = statements[0][0].compile().params
+    assert ledger_row["name"] == "demo_fork"
+    assert ledger_row["holding"] == {"AAPL": 10}
+    assert ledger_row["balance"] == 98500.25
+    # a fork is a new ledger, not a copy of the source's creation time
+    assert "created_at" not in ledger_row
+
+    # legacy history goes back on the ledger row, the rest in one insert per chunk
+    assert statements[1][0].compile().params["trades"] == [{"ticker": "MSFT", "type": "buy"}]
+    assert statements[2][1] == [
+        {"ledger_name": "demo_fork", "executed_at": EXECUTED_AT, "tick_id": "t1", "trade": {"ticker": "AAPL", "type": "buy"}}
+    ]
+    assert statements[3][1] == [{"ledger_name": "demo_fork", "recorded_at": RECORDED_AT, "value": 100000.5}]
+    assert {call.args[1].month for call in mock_partitions.call_args_list} == {9, 10}
+
+
+@patch("utils.snapshots.ensure_partitions")
+def test_snapshot_round_trip_keeps_decimals_exact(mock_partitions):
+    """
+    Test that NUMERIC balances and values survive export and restore without float rounding.
+    """
+    balance = Decimal("0.1")
+    value = Decimal("100000.123456789012345")
+    source = source_connection()
+    header, trades, values = source.execute.side_effect
+    header.fetchone.return_value.balance = balance
+    values.partitions.return_value = [[(RECORDED_AT, value)]]
+    source.execute.side_effect = [header, trades, values]
+    snapshot = b"".join(encode_snapshot(snapshot_records(source, "demo")))
+
+    conn = MagicMock()
+    restore_snapshot(conn, decode_snapshot(io.BytesIO(snapshot)), "demo_fork")
+
+    statements = [call.args for call in conn.execute.call_args_list]
+    restored_balance = statements[0][0].compile().params["balance"]
+    assert isinstance(restored_balance, Decimal) and restored_balance == balance
+    restored_value = statements[3][1][0]["value"]
+    assert isinstance(restored_value, Decimal) and restored_value == value
+
+
+@patch("utils.snapshots.ensure_partitions")
+def test_restore_rejects_truncated_snapshot(mock_partitions):
+    """
+    Test that a snapshot missing its end line is rejected.
+    """
+    with pytest.raises(ValueError, match="truncated"):
+        restore_snapshot(MagicMock(), exported_records()[:-1])
+
+
+def test_restore_rejects_newer_version():
+    """
+    Test that a snapshot written by a newer format version is rejected before anything is written.
+    """
+    header = exported_records()[0]
+    conn = MagicMock()
+
+    with pytest.raises(ValueError, match="newer"):
+        restore_snapshot(conn, [{**header, "version": 2}])
+    conn.execute.assert_not_called()
+
+
+@patch("utils.snapshots.ensure_partitions")
+def test_import_ledger_endpoint(mock_partitions, client, mock_db_connection, ledger_registry):
+    """
+    Test that /import_ledger restores an uploaded snapshot under the requested name and registers it.
+    """
+    snapshot = b"".join(encode_snapshot(exported_records()))
+
+    response = client.post("/import_ledger?name=demo_fork", data=snapshot)
+
+    assert response.status_code == 201
+    assert response.json["trades"] == 1
+    mock_db_connection.commit.assert_called_once()
+    assert ledger_registry._registry["demo_fork"].status == "created"
+
+    response = client.post("/import_ledger", data=b"not a snapshot")
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("violation, status", [(UniqueViolation, 409), (CheckViolation, 400)])
+@patch("utils.snapshots.ensure_partitions")
+def test_import_ledger_constraint_violations(mock_partitions, violation, status, client, mock_db_connection):
+    """
+    Test that /import_ledger reports a taken name as a conflict and any other violated constraint as a bad snapshot.
+    """
+    mock_db_connection.execute.side_effect = IntegrityError("INSERT INTO ledger", {}, violation("violated"))
+    snapshot = b"".join(encode_snapshot(exported_records()))
+
+    response = client.post("/import_ledger?name=demo_fork", data=snapshot)
+
+    assert response.status_code == status
+    mock_db_connection.commit.assert_not_called()
+
+
+@patch("app.get_db_connection")
+def test_export_ledger_endpoint(mock_get_db_connection, client, ledger_registry):
+    """
+    Test that /export_ledger streams a gzip snapshot of the ledger from the read replica.
+    """
+    ledger_registry.register_ledger(ledger_registry.LedgerInfo("demo", ["AAPL"], "link", 5, 7, "running", None))
+    mock_get_db_connection.return_value.__enter__.return_value = source_connection()
+
+    response = client.get("/export_ledger?name=demo")
+
+    assert response.status_code == 200
+    assert response.headers["Content-Disposition"] == 'attachment; filename="demo.ledger.gz"'
+    records = list(decode_snapshot(io.BytesIO(response.data)))
+    assert records[0]["ledger"]["name"] == "demo"
+    assert records[-1] == {"end": {"trades": 1, "values": 1}}
+    mock_get_db_connection.assert_called_once_with(readonly=True)
+
+    with patch("app.lookup_ledger", return_value=None):
+        assert client.get("/export_ledger?name=missing").status_code == 404
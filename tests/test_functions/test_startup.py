@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# dependencies that should only be loaded once an endpoint or task actually uses them.
+# lazily imported packages sit in sys.modules unexecuted, so check for one of their submodules
+HEAVY_MODULES = ["pandas", "numpy.linalg", "yfinance.ticker", "docker.api", "fsspec.spec"]
+
+
+def _loaded_modules(entry_point):
+    code = f"import sys, {entry_point}; print(' '.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    return set(result.stdout.split())
+
+
+def test_api_entry_point_defers_heavy_imports():
+    loaded = _loaded_modules("wsgi")
+    assert not loaded.intersection(HEAVY_MODULES)
+
+
+def test_worker_entry_point_skips_flask():
+    loaded = _loaded_modules("worker")
+    assert "flask" not in loaded
+    assert not loaded.intersection(HEAVY_MODULES)
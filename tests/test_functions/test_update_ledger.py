@@ -46,3 +46,46 @@ def test_update_ledger_missing_fields(client, mock_db_connection):
     assert response.status_code == 400
     response_data = json.loads(response.data.decode('utf-8'))
     assert "Missing required fields" in response_data.get("error", "")
+
+
+def _ledger_row():
+    row = Mock()
+    row.trades = []
+    row.balance = 10000
+    row.value = {}
+    return row
+
+
+@patch('utils.ledger_store.ensure_partitions')
+@patch('app.calculate_total_value', return_value=10000)
+def test_update_ledger_applies_new_tick(mock_value, mock_ensure, client, mock_db_connection):
+    mock_db_connection.execute.return_value.fetchone.side_effect = [_ledger_row(), ("tick-1",)]
+
+    response = client.patch(
+        "/update_ledger",
+        data=json.dumps({'name': 'test_ledger', 'trades': [], 'holding': {}, 'tick_id': 'tick-1'}),
+        content_type='application/json',
+        headers={'X-API-Key': 'test-key'}
+    )
+
+    assert response.status_code == 200
+    assert "updated successfully" in response.get_json()["message"]
+    mock_db_connection.commit.assert_called_once()
+
+
+@patch('app.calculate_total_value', return_value=10000)
+def test_update_ledger_duplicate_tick(mock_value, client, mock_db_connection):
+    """A retried update for an already-applied tick is acknowledged but not applied again"""
+    mock_db_connection.execute.return_value.fetchone.side_effect = [_ledger_row(), None]
+
+    response = client.patch(
+        "/update_ledger",
+        data=json.dumps({'name': 'test_ledger', 'trades': [], 'holding': {}, 'tick_id': 'tick-1'}),
+        content_type='application/json',
+        headers={'X-API-Key': 'test-key'}
+    )
+
+    assert response.status_code == 200
+    assert response.get_json()["duplicate"] is True
+    mock_db_connection.commit.assert_not_called()
+    mock_value.assert_not_called()
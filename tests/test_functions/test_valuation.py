@@ -0,0 +1,62 @@
+import math
+from datetime import datetime, timezone
+from unittest.mock import patch, MagicMock
+from utils.valuation import get_quote_snapshot, is_market_open, revalue_ledgers, value_portfolios
+
+
+def test_is_market_open():
+    # 2025-04-07 is a Monday; 14:00 UTC is 10:00 in New York
+    assert is_market_open(datetime(2025, 4, 7, 14, 0, tzinfo=timezone.utc))
+    assert not is_market_open(datetime(2025, 4, 7, 13, 0, tzinfo=timezone.utc))
+    assert not is_market_open(datetime(2025, 4, 7, 20, 0, tzinfo=timezone.utc))
+    assert not is_market_open(datetime(2025, 4, 5, 14, 0, tzinfo=timezone.utc))
+
+
+def test_value_portfolios():
+    values = value_portfolios(
+        [{"AAPL": 2, "GOOG": 1}, {}, {"MSFT": 1}, {"MSFT": 0, "AAPL": 1}],
+        [100, 50, 10, 0],
+        {"AAPL": 10.0, "GOOG": 20.0},
+    )
+
+    assert list(values[:2]) == [140.0, 50.0]
+    # MSFT has no price
+    assert math.isnan(values[2])
+    # but holding none of it does not matter
+    assert values[3] == 10.0
+
+
+def _row(name, holding, balance):
+    row = MagicMock()
+    row.name = name
+    row.holding = holding
+    row.balance = balance
+    return row
+
+
+@patch("utils.valuation.publish_ledger_updates")
+@patch("utils.valuation.ensure_partitions")
+@patch("utils.valuation.get_current_prices", return_value={"AAPL": 10.0})
+def test_revalue_ledgers_single_snapshot(mock_prices, mock_ensure, mock_publish, mock_redis):
+    """All ledgers are valued from one quote fetch and inserted in one statement"""
+    mock_conn = MagicMock()
+    mock_conn.execute.return_value.fetchall.return_value = [
+        _row("a", {"AAPL": 1}, 90), _row("b", {"AAPL": 3}, 0), _row("c", {"TSLA": 1}, 0),
+    ]
+    now = datetime(2025, 4, 7, 14, 0, tzinfo=timezone.utc)
+
+    assert revalue_ledgers(mock_conn, now) == 2
+
+    mock_prices.assert_called_once_with(["AAPL", "TSLA"])
+    points = mock_conn.execute.call_args_list[1][0][1]
+    assert points == [
+        {"ledger_name": "a", "recorded_at": now, "value": 100.0},
+        {"ledger_name": "b", "recorded_at": now, "value": 30.0},
+    ]
+    assert [event["name"] for event in mock_publish.call_args[0][0]] == ["a", "b"]
+    mock_redis.pipeline.return_value.hset.assert_called_once_with("ledger-quotes", mapping={"AAPL": 10.0})
+
+
+def test_get_quote_snapshot(mock_redis):
+    mock_redis.hmget.return_value = [b"10.5", None]
+    assert get_quote_snapshot(["AAPL", "GOOG"]) == {"AAPL": 10.5}
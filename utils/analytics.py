@@ -0,0 +1,272 @@
+"""
+Portfolio analytics over a ledger's value series.
+
+Metrics for each (ledger, window) pair are kept in RollingStats objects that are updated
+incrementally as value points arrive: every process listens on the ledger update channel
+(see utils/ledger_events.py), so caches on all API replicas follow every update_ledger call.
+A cold cache is seeded from the ledger's full history with a single vectorized pass; updates
+that arrive while the history loads are buffered and replayed onto it.
+Entries are dropped whenever the ledger registry announces a change to the ledger. While the
+subscription is down nothing is cached, and every request computes its window from the database.
+"""
+import json
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from utils.lazy_imports import lazy_import
+from utils.ledger_registry import REGISTRY_CHANNEL
+from utils.ledger_events import UPDATES_CHANNEL
+from utils.redis_utils import get_redis_client
+
+np = lazy_import("numpy")
+
+# windows, in value points, that /ledger_stats serves; None covers the whole history
+WINDOWS = {"20": 20, "50": 50, "100": 100, "250": 250, "all": None}
+
+SECONDS_PER_YEAR = 365.25 * 24 * 60 * 60
+
+_stats = {}
+# updates received while a (ledger, window) entry's history is loading
+_pending = {}
+_lock = threading.Lock()
+_listener = None
+_listener_retry_at = 0
+
+# how often a failed subscription is retried; until one succeeds nothing is cached
+LISTENER_RETRY_SECONDS = 5
+
+
+def _annualization(timestamps):
+    """Number of value points per year, from the median spacing between points."""
+    if len(timestamps) < 2:
+        return None
+    seconds = np.diff(np.array([ts.timestamp() for ts in timestamps]))
+    spacing = float(np.median(seconds))
+    return SECONDS_PER_YEAR / spacing if spacing > 0 else None
+
+
+def compute_metrics(timestamps, values, balance=None):
+    """
+    Compute return and risk metrics of a value series in one vectorized pass.
+
+    Args:
+        timestamps (list): Time of each value point, oldest first.
+        values (list): Portfolio value at each point.
+        balance (float): Current cash balance, for exposure.
+
+    Returns:
+        dict: points, total_return, mean_return, volatility, sharpe, max_drawdown and exposure.
+        Metrics that need more points than available are None.
+    """
+    values = np.asarray(values, dtype=float)
+    returns = values[1:] / values[:-1] - 1 if len(values) > 1 else np.empty(0)
+    std = float(returns.std(ddof=1)) if len(returns) > 1 else None
+    return _metrics(
+        timestamps,
+        values,
+        float(returns.mean()) if len(returns) else None,
+        std,
+        balance,
+    )
+
+
+def _metrics(timestamps, values, mean, std, balance):
+    periods = _annualization(timestamps)
+    volatility = std * math.sqrt(periods) if std is not None and periods else None
+    sharpe = mean / std * math.sqrt(periods) if std and periods else None
+
+    max_drawdown = None
+    if len(values):
+        max_drawdown = float((values / np.maximum.accumulate(values) - 1).min())
+
+    exposure = None
+    if balance is not None and len(values) and values[-1]:
+        exposure = 1 - balance / float(values[-1])
+
+    return {
+        "points": len(values),
+        "total_return": float(values[-1] / values[0] - 1) if len(values) > 1 else None,
+        "mean_return": mean,
+        "volatility": volatility,
+        "sharpe": sharpe,
+        "max_drawdown": max_drawdown,
+        "exposure": exposure,
+    }
+
+
+class RollingStats:
+    """Metrics over the last `window` value points (all points if `window` is None), updated one point at a time."""
+
+    def __init__(self, window=None):
+        self.window = window
+        maxlen = window or None
+        self.timestamps = deque(maxlen=maxlen)
+        self.values = deque(maxlen=maxlen)
+        self.balance = None
+        # running sums of the returns between the points in the window
+        self._sum = 0.0
+        self._sumsq = 0.0
+
+    @classmethod
+    def from_series(cls, timestamps, values, balance=None, window=None):
+        stats = cls(window)
+        stats.timestamps.extend(timestamps)
+        stats.values.extend(float(value) for value in values)
+        stats.balance = balance
+        if len(stats.values) > 1:
+            window_values = np.asarray(stats.values, dtype=float)
+            returns = window_values[1:] / window_values[:-1] - 1
+            stats._sum = float(returns.sum())
+            stats._sumsq = float((returns ** 2).sum())
+        return stats
+
+    def add(self, timestamp, value, balance=None):
+        """Add a value point. Points no newer than the latest one are ignored, so replays are harmless."""
+        if self.timestamps and timestamp <= self.timestamps[-1]:
+            return
+        value = float(value)
+        if self.values:
+            if self.window and len(self.values) == self.values.maxlen:
+                evicted = self.values[1] / self.values[0] - 1
+                self._sum -= evicted
+                self._sumsq -= evicted ** 2
+            ret = value / self.values[-1] - 1
+            self._sum += ret
+            self._sumsq += ret ** 2
+        self.timestamps.append(timestamp)
+        self.values.append(value)
+        if balance is not None:
+            self.balance = float(balance)
+
+    def metrics(self):
+        n = len(self.values) - 1
+        mean = self._sum / n if n > 0 else None
+        std = None
+        if n > 1:
+            std = math.sqrt(max(self._sumsq - n * mean ** 2, 0.0) / (n - 1))
+        return _metrics(list(self.timestamps), np.asarray(self.values, dtype=float), mean, std, self.balance)
+
+
+def get_ledger_stats(name, window, load_series):
+    """
+    Metrics for a ledger over a window, served from the cache when warm.
+
+    Args:
+        name (str): Name of the ledger.
+        window (int): Window size in value points, or None for all history.
+        load_series (callable): Returns (timestamps, values, balance) for the ledger, or None. Only called on a cache miss.
+
+    Returns:
+        dict: The metrics, or None if the ledger does not exist.
+    """
+    # cached windows are only trusted while updates are being received
+    if not _listening():
+        series = load_series()
+        if series is None:
+            return None
+        timestamps, values, balance = series
+        return RollingStats.from_series(timestamps, values, balance, window).metrics()
+
+    key = (name, window)
+    stats = _stats.get(key)
+    if stats is None:
+        with _lock:
+            pending = _pending.setdefault(key, RollingStats())
+        series = load_series()
+        if series is None:
+            with _lock:
+                _pending.pop(key, None)
+            return None
+        timestamps, values, balance = series
+        stats = RollingStats.from_series(timestamps, values, balance, window)
+
+        with _lock:
+            for timestamp, value in zip(pending.timestamps, pending.values):
+                stats.add(timestamp, value)
+            if pending.balance is not None and stats.timestamps[-1] == pending.timestamps[-1]:
+                stats.balance = pending.balance
+            # not cached if the ledger changed while loading, or another request already cached it
+            if _pending.get(key) is pending:
+                del _pending[key]
+                stats = _stats.setdefault(key, stats)
+            return stats.metrics()
+
+    with _lock:
+        return stats.metrics()
+
+
+def record_value_point(name, timestamp, value, balance=None):
+    """Feed a new value point into every cached window of the ledger."""
+    with _lock:
+        for cache in (_stats, _pending):
+            for (ledger_name, _), stats in cache.items():
+                if ledger_name == name:
+                    stats.add(timestamp, value, balance)
+
+
+def drop_ledger_stats(name):
+    with _lock:
+        for cache in (_stats, _pending):
+            for key in [key for key in cache if key[0] == name]:
+                del cache[key]
+
+
+def _handle_update(message):
+    event = json.loads(message["data"])
+    record_value_point(event["name"], datetime.fromisoformat(event["timestamp"]), event["value"], event["balance"])
+
+
+def _handle_registry_change(message):
+    drop_ledger_stats(json.loads(message["data"])["name"])
+
+
+def _handle_listener_error(e, pubsub, thread):
+    # updates may have been missed while disconnected
+    print(f"Analytics listener error: {e}")
+    with _lock:
+        _stats.clear()
+        _pending.clear()
+
+
+def _listener_alive():
+    return _listener is not None and _listener.is_alive()
+
+
+def _listening():
+    """Whether updates are being received, retrying a failed subscription at most every LISTENER_RETRY_SECONDS."""
+    global _listener_retry_at
+    if _listener_alive():
+        return True
+    now = time.monotonic()
+    if now < _listener_retry_at:
+        return False
+    _listener_retry_at = now + LISTENER_RETRY_SECONDS
+    start_analytics_listener()
+    if not _listener_alive():
+        return False
+    # windows cached before the subscription was lost may have missed updates
+    with _lock:
+        _stats.clear()
+        _pending.clear()
+    return True
+
+
+def start_analytics_listener():
+    """Subscribe to ledger updates on a background thread. Safe to call more than once."""
+    global _listener
+    with _lock:
+        if _listener_alive():
+            return
+        _listener = None
+        try:
+            pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+            pubsub.psubscribe(**{UPDATES_CHANNEL.format("*"): _handle_update})
+            pubsub.subscribe(**{REGISTRY_CHANNEL: _handle_registry_change})
+            _listener = pubsub.run_in_thread(
+                sleep_time=1.0, daemon=True, exception_handler=_handle_listener_error
+            )
+        except Exception as e:
+            print(f"Failed to subscribe to ledger updates for analytics: {e}")
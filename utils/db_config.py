@@ -1,8 +1,14 @@
+import os
+
 from sqlalchemy import (
     ARRAY,
     NUMERIC,
     TIMESTAMP,
+    BigInteger,
     Column,
+    ForeignKey,
+    Identity,
+    Index,
     Integer,
     MetaData,
     Table,
@@ -17,8 +23,16 @@ DB_PASSWORD = "watstreet"
 DB_HOST = "localhost"
 DB_PORT = "5432"
 
+# optional streaming replica that serves read-only endpoints
+DB_REPLICA_HOST = os.environ.get("LEDGER_DB_REPLICA_HOST")
+
 engine = create_engine(f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
 
+if DB_REPLICA_HOST:
+    read_engine = create_engine(f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_REPLICA_HOST}:{DB_PORT}/{DB_NAME}")
+else:
+    read_engine = engine
+
 metadata = MetaData()
 
 ledger = Table(
@@ -29,13 +43,70 @@ ledger = Table(
     Column("algo_link", Text, nullable=False),
     Column("update_time", Integer, nullable=False),
     Column("end_duration", Integer, nullable=False),
+    # trades and value are only kept for ledgers created before ledger_trades/ledger_values existed
     Column("trades", JSONB, server_default="[]"),
     Column("holding", JSONB, server_default="{}"),
     Column("value", JSONB, server_default="{}"),
     Column("balance", NUMERIC, nullable=False, server_default="100000"),
     Column("created_at", TIMESTAMP, server_default="CURRENT_TIMESTAMP"),
+    Column("status", Text, nullable=False, server_default="created"),
+    Column("start_time", TIMESTAMP),
+    # registry reference of the ledger's image, pinned by digest. NULL for ledgers whose image is a tar in docker_images
+    Column("image", Text),
+)
+
+# one row per trade cycle, recording what the tick's container run produced
+ledger_ticks = Table(
+    "ledger_ticks",
+    metadata,
+    Column("ledger_name", Text, ForeignKey("order_books_v2.name", ondelete="CASCADE"), primary_key=True),
+    Column("tick_id", Text, primary_key=True),
+    Column("started_at", TIMESTAMP, nullable=False),
+    Column("finished_at", TIMESTAMP, nullable=False),
+    Column("status", Text, nullable=False),
+    Column("error", Text),
+)
+
+# one row per applied update_ledger call; the primary key deduplicates retried requests
+ledger_updates = Table(
+    "ledger_updates",
+    metadata,
+    Column("ledger_name", Text, ForeignKey("order_books_v2.name", ondelete="CASCADE"), primary_key=True),
+    Column("tick_id", Text, primary_key=True),
+    Column("trade_count", Integer, nullable=False),
+    Column("applied_at", TIMESTAMP, nullable=False, server_default="CURRENT_TIMESTAMP"),
+)
+
+
+# Trade and value history, range-partitioned by month (see utils/partitions.py).
+# The partition column is part of the primary key, as Postgres requires.
+ledger_trades = Table(
+    "ledger_trades",
+    metadata,
+    Column("id", BigInteger, Identity(), primary_key=True),
+    Column("executed_at", TIMESTAMP(timezone=True), primary_key=True),
+    Column("ledger_name", Text, nullable=False),
+    Column("tick_id", Text),
+    Column("trade", JSONB, nullable=False),
+    Index("ledger_trades_ledger_idx", "ledger_name", "executed_at"),
+    postgresql_partition_by="RANGE (executed_at)",
+)
+
+ledger_values = Table(
+    "ledger_values",
+    metadata,
+    Column("ledger_name", Text, primary_key=True),
+    Column("recorded_at", TIMESTAMP(timezone=True), primary_key=True),
+    Column("value", NUMERIC, nullable=False),
+    postgresql_partition_by="RANGE (recorded_at)",
 )
 
 
-def get_db_connection():
+def get_db_connection(readonly=False):
+    """
+    Open a connection to the primary, or to the read replica when `readonly` is set.
+    Replica reads may lag the primary slightly, so only use them where that is acceptable.
+    """
+    if readonly:
+        return read_engine.connect()
     return engine.connect()
@@ -1,5 +1,13 @@
-import docker
 import os
+import threading
+
+from utils.lazy_imports import lazy_import
+
+docker = lazy_import("docker")
+requests = lazy_import("requests")
+
+# registry (e.g. a local registry:2 container) that ledger images are pushed to and pulled from
+IMAGE_REGISTRY = os.environ.get("LEDGER_IMAGE_REGISTRY", "localhost:5000")
 
 _docker_client = None
 
@@ -20,17 +28,157 @@ def build_docker_image(name, dockerfile_path):
         raise RuntimeError(f"Error building Docker image: {e}")
 
 
-def run_docker_container(image_name, command=None):
+def registry_repository(ledger_name):
+    """Repository of a ledger's image in the image registry."""
+    return f"{IMAGE_REGISTRY}/ledger-{ledger_name}"
+
+
+def push_docker_image(image, ledger_name):
+    """
+    Push a built image to the ledger's repository in the image registry and return its digest reference.
+    The registry stores layers by content, so layers shared with other ledgers' images are not uploaded or stored again.
+    """
+    client = get_docker_client()
+    repository = registry_repository(ledger_name)
+    image.tag(repository, "latest")
+
+    digest = None
+    for status in client.images.push(repository, tag="latest", stream=True, decode=True):
+        if "error" in status:
+            raise RuntimeError(f"Error pushing Docker image: {status['error']}")
+        digest = status.get("aux", {}).get("Digest", digest)
+
+    if digest is None:
+        raise RuntimeError(f"Registry did not return a digest for '{repository}'")
+    return f"{repository}@{digest}"
+
+
+def ensure_docker_image(image_name, image_dir="docker_images"):
+    """
+    Make sure an image is available locally.
+    Digest references are pulled from the registry if this node does not have them yet; the
+    node's image store then serves as the pull cache for later ticks. Plain names are ledgers
+    created before the registry was used, and are loaded from their saved tar.
+    """
+    client = get_docker_client()
+    try:
+        client.images.get(image_name)
+    except docker.errors.ImageNotFound:
+        if "@" in image_name:
+            client.images.pull(image_name)
+            print(f"Pulled Docker image '{image_name}'")
+            return
+
+        path_to_image = os.path.join(image_dir, f"{image_name}.tar")
+        if not os.path.exists(path_to_image):
+            raise RuntimeError(f"Docker image '{image_name}' is not available on this node")
+        with open(path_to_image, "rb") as image_tar:
+            client.images.load(image_tar)
+        print(f"Loaded Docker image '{image_name}' from {path_to_image}")
+
+
+def remove_docker_image(image_name):
+    """Remove an image or tag from this node. Missing images and images still in use are left alone."""
+    try:
+        get_docker_client().images.remove(image_name)
+    except docker.errors.ImageNotFound:
+        pass
+    except docker.errors.APIError as e:
+        print(f"Could not remove Docker image '{image_name}': {e}")
+
+
+def discard_built_image(ledger_name, image_dir="docker_images"):
+    """Remove the tags a ledger's image was built and pushed with, and its tar from before images went to the registry."""
+    remove_docker_image(ledger_name)
+    remove_docker_image(registry_repository(ledger_name))
+    path_to_image = os.path.join(image_dir, f"{ledger_name}.tar")
+    if os.path.exists(path_to_image):
+        os.remove(path_to_image)
+
+
+def delete_registry_image(image_ref):
+    """
+    Delete an image's manifest from the registry, so its layers become unreferenced unless another
+    ledger's image shares them. The registry reclaims unreferenced layers on `registry garbage-collect`.
+    Requires the registry to run with REGISTRY_STORAGE_DELETE_ENABLED=true.
+    """
+    repository, digest = image_ref.split("@", 1)
+    host, path = repository.split("/", 1)
+    response = requests.delete(f"http://{host}/v2/{path}/manifests/{digest}", timeout=10)
+    if response.status_code not in (202, 404):
+        raise RuntimeError(f"Error deleting '{image_ref}' from the registry: {response.status_code} {response.text}")
+
+
+def ledger_container_name(ledger_name):
+    """Name given to a ledger's trade container, so it can be stopped from another process."""
+    return f"ledger-{ledger_name}"
+
+
+def stream_docker_container(image_name, output, command=None, container_name=None, environment=None, volumes=None):
+    """
+    Run a container to completion, writing its stdout and stderr into `output` chunk by chunk
+    as they are produced, so the output is never held in memory. Raises if the container exits non-zero.
+
+    Returns:
+        dict: The container's cpu_seconds and memory_peak_bytes, sampled from its stats about once a second.
+    """
+    client = get_docker_client()
+    if container_name is not None:
+        _remove_stale_container(client, container_name)
     try:
-        client = get_docker_client()
         container = client.containers.run(
             image_name,
-            command=command
+            command=command,
+            name=container_name,
+            environment=environment,
+            volumes=volumes,
+            detach=True
         )
-        return container
     except Exception as e:
         raise RuntimeError(f"Error running Docker container: {e}")
 
+    usage = {"cpu_seconds": 0.0, "memory_peak_bytes": 0}
+    sampler = threading.Thread(target=_sample_container_stats, args=(container, usage), daemon=True)
+    sampler.start()
+
+    try:
+        for chunk in container.logs(stdout=True, stderr=True, stream=True, follow=True):
+            output.write(chunk)
+        exit_code = container.wait()["StatusCode"]
+    finally:
+        container.remove(force=True)
+        # the stats stream ends once the container is gone
+        sampler.join(timeout=2)
+
+    if exit_code != 0:
+        raise RuntimeError(f"Docker container exited with status {exit_code}")
+    return usage
+
+
+def _remove_stale_container(client, container_name):
+    # a worker killed mid-tick leaves its container behind, and the name would conflict with every later tick
+    try:
+        client.containers.get(container_name).remove(force=True)
+        print(f"Removed stale container '{container_name}'")
+    except docker.errors.NotFound:
+        pass
+    except Exception as e:
+        raise RuntimeError(f"Error removing stale Docker container: {e}")
+
+
+def _sample_container_stats(container, usage):
+    try:
+        for stats in container.stats(stream=True, decode=True):
+            cpu = stats.get("cpu_stats", {}).get("cpu_usage", {}).get("total_usage")
+            if cpu:
+                usage["cpu_seconds"] = cpu / 1e9
+            memory = stats.get("memory_stats", {}).get("usage")
+            if memory:
+                usage["memory_peak_bytes"] = max(usage["memory_peak_bytes"], memory)
+    except Exception:
+        # the container can disappear mid-read; whatever was sampled so far is kept
+        pass
+
 
 def stop_docker_container(image_name):
     try:
@@ -1,6 +1,9 @@
-import fsspec
 from pathlib import Path
 
+from utils.lazy_imports import lazy_import
+
+fsspec = lazy_import("fsspec")
+
 
 def extract_components(url: str) -> list:
     """
@@ -0,0 +1,23 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from utils.lazy_imports import lazy_import
+
+orjson = lazy_import("orjson", optional=True)
+
+
+def _default(obj):
+    # as strings, like Flask's jsonify, so NUMERIC columns keep their precision
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not serializable")
+
+
+def dumps_json(payload):
+    """Encode a payload as JSON bytes. Decimals and datetimes become strings."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,32 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name, optional=False):
+    """
+    Import a module without executing it until one of its attributes is first used.
+    Heavy dependencies (yfinance pulls in pandas and numpy) are only paid for by the
+    processes and endpoints that actually use them.
+
+    Args:
+        name (str): Absolute module name.
+        optional (bool): Return None instead of raising if the module is not installed.
+
+    Returns:
+        module: The (not yet executed) module, or None for a missing optional module.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        if optional:
+            return None
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
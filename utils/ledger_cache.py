@@ -0,0 +1,47 @@
+"""
+Cache-aside for ledger views.
+
+view_ledger responses are cached in Redis for LEDGER_VIEW_CACHE_TTL seconds and invalidated
+whenever the ledger changes (update, valuation, deletion). The TTL bounds how long a view can
+stay stale if a read races with an invalidation. Set LEDGER_VIEW_CACHE_TTL=0 to disable.
+"""
+import json
+import os
+
+from utils.json_utils import dumps_json
+from utils.redis_utils import get_redis_client
+
+VIEW_CACHE_KEY = "ledger-view:{}"
+
+VIEW_CACHE_TTL = int(os.environ.get("LEDGER_VIEW_CACHE_TTL", "30"))
+
+
+def get_cached_view(name):
+    """The cached view of a ledger, or None on a miss."""
+    if not VIEW_CACHE_TTL:
+        return None
+    try:
+        cached = get_redis_client().get(VIEW_CACHE_KEY.format(name))
+    except Exception as e:
+        print(f"Failed to read cached view of ledger '{name}': {e}")
+        return None
+    return json.loads(cached) if cached else None
+
+
+def set_cached_view(name, payload):
+    if not VIEW_CACHE_TTL:
+        return
+    try:
+        get_redis_client().set(VIEW_CACHE_KEY.format(name), dumps_json(payload), ex=VIEW_CACHE_TTL)
+    except Exception as e:
+        print(f"Failed to cache view of ledger '{name}': {e}")
+
+
+def invalidate_views(names):
+    """Drop the cached views of the given ledgers."""
+    if not VIEW_CACHE_TTL or not names:
+        return
+    try:
+        get_redis_client().delete(*[VIEW_CACHE_KEY.format(name) for name in names])
+    except Exception as e:
+        print(f"Failed to invalidate cached views of {len(names)} ledgers: {e}")
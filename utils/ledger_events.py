@@ -0,0 +1,63 @@
+"""
+Live ledger updates for dashboards.
+
+update_ledger publishes each committed update once on the ledger's Redis channel; every
+/ledger_stream connection, on any API replica, holds its own subscription and relays the
+updates to its client as server-sent events.
+"""
+from utils.redis_utils import get_redis_client
+from utils.json_utils import dumps_json
+
+UPDATES_CHANNEL = "ledger-updates:{}"
+
+# comment lines keep idle connections from being closed by proxies
+HEARTBEAT_SECONDS = 15
+
+
+def ledger_update_event(name, timestamp, trades, holding, balance, value):
+    return {
+        "name": name,
+        "timestamp": str(timestamp),
+        "trades": trades,
+        "holding": holding,
+        "balance": balance,
+        "value": value,
+    }
+
+
+def publish_ledger_update(name, timestamp, trades, holding, balance, value):
+    """Publish a committed ledger update. Failures are logged, never raised, so they cannot undo the update."""
+    publish_ledger_updates([ledger_update_event(name, timestamp, trades, holding, balance, value)])
+
+
+def publish_ledger_updates(events):
+    """Publish several committed updates in one round trip."""
+    try:
+        pipeline = get_redis_client().pipeline(transaction=False)
+        for event in events:
+            pipeline.publish(UPDATES_CHANNEL.format(event["name"]), dumps_json(event))
+        pipeline.execute()
+    except Exception as e:
+        print(f"Failed to publish {len(events)} ledger updates: {e}")
+
+
+def stream_ledger_updates(name):
+    """
+    Generator of server-sent events for a ledger's updates.
+    Runs until the client disconnects, at which point the subscription is closed.
+    """
+    pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(UPDATES_CHANNEL.format(name))
+    try:
+        yield f": streaming updates for {name}\n\n"
+        while True:
+            message = pubsub.get_message(timeout=HEARTBEAT_SECONDS)
+            if message is None:
+                yield ": heartbeat\n\n"
+                continue
+            data = message["data"]
+            if isinstance(data, bytes):
+                data = data.decode("utf-8")
+            yield f"event: update\ndata: {data}\n\n"
+    finally:
+        pubsub.close()
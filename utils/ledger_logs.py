@@ -0,0 +1,132 @@
+"""
+Per-tick model output.
+
+Each trade cycle's container output (stdout and stderr, interleaved) is streamed in chunks into
+a gzip file under LEDGER_LOG_DIR/<ledger>/, named by tick start time and tick id. The API reads
+the same directory, so on multi-node setups it must be shared storage.
+
+A tick keeps at most MAX_TICK_LOG_BYTES of output: the beginning, then a truncation marker and the
+last TAIL_BYTES. Only the newest LOG_RETENTION_TICKS files are kept per ledger.
+"""
+import gzip
+import os
+import re
+import shutil
+from datetime import datetime
+
+LOG_DIR = os.environ.get("LEDGER_LOG_DIR", "ledger_logs")
+
+MAX_TICK_LOG_BYTES = 1024 * 1024
+TAIL_BYTES = 64 * 1024
+
+LOG_RETENTION_TICKS = int(os.environ.get("LEDGER_LOG_RETENTION_TICKS", "500"))
+
+_TICK_FILE = re.compile(r"^(\d{8}T\d{12})-(\w+)\.log\.gz$")
+
+
+def ledger_log_dir(name, log_dir=LOG_DIR):
+    if not name or name in (".", "..") or os.path.basename(name) != name:
+        raise ValueError(f"Invalid ledger name for a log directory: {name!r}")
+    return os.path.join(log_dir, name)
+
+
+class TickLogWriter:
+    """File-like sink for one tick's container output. Memory use is bounded by TAIL_BYTES."""
+
+    def __init__(self, name, tick_id, started_at, log_dir=LOG_DIR):
+        directory = ledger_log_dir(name, log_dir)
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{started_at:%Y%m%dT%H%M%S%f}-{tick_id}.log.gz")
+        self._file = gzip.open(self.path, "wb")
+        self._head_left = MAX_TICK_LOG_BYTES - TAIL_BYTES
+        self._tail = bytearray()
+        self._dropped = 0
+
+    def write(self, chunk):
+        if self._head_left > 0:
+            head = chunk[:self._head_left]
+            self._file.write(head)
+            self._head_left -= len(head)
+            chunk = chunk[len(head):]
+        if chunk:
+            self._tail += chunk
+            if len(self._tail) > TAIL_BYTES:
+                excess = len(self._tail) - TAIL_BYTES
+                del self._tail[:excess]
+                self._dropped += excess
+
+    def close(self):
+        if self._dropped:
+            self._file.write(f"\n[... {self._dropped} bytes truncated ...]\n".encode())
+        self._file.write(bytes(self._tail))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def list_tick_logs(name, log_dir=LOG_DIR):
+    """The stored ticks of a ledger, oldest first, as dicts with tick_id, started_at and compressed size."""
+    directory = ledger_log_dir(name, log_dir)
+    if not os.path.isdir(directory):
+        return []
+
+    ticks = []
+    for file_name in sorted(os.listdir(directory)):
+        match = _TICK_FILE.match(file_name)
+        if match:
+            ticks.append({
+                "tick_id": match.group(2),
+                "started_at": datetime.strptime(match.group(1), "%Y%m%dT%H%M%S%f").isoformat(),
+                "size": os.path.getsize(os.path.join(directory, file_name)),
+            })
+    return ticks
+
+
+def _tick_log_path(name, tick_id, log_dir):
+    directory = ledger_log_dir(name, log_dir)
+    if os.path.isdir(directory):
+        for file_name in os.listdir(directory):
+            match = _TICK_FILE.match(file_name)
+            if match and match.group(2) == tick_id:
+                return os.path.join(directory, file_name)
+    return None
+
+
+def read_tick_log(name, tick_id, offset=0, length=None, tail=None, log_dir=LOG_DIR):
+    """
+    Read part of a tick's output: `length` bytes from `offset` (all by default), or the last `tail` bytes.
+    Returns None if the tick has no stored output.
+    """
+    path = _tick_log_path(name, tick_id, log_dir)
+    if path is None:
+        return None
+
+    with gzip.open(path, "rb") as log_file:
+        if tail is not None:
+            # output is capped at MAX_TICK_LOG_BYTES, so reading it all is bounded
+            data = log_file.read()
+            offset = max(len(data) - tail, 0)
+            return {"tick_id": tick_id, "offset": offset, "data": data[offset:], "eof": True}
+
+        log_file.seek(offset)
+        data = log_file.read() if length is None else log_file.read(length)
+        eof = length is None or not log_file.read(1)
+    return {"tick_id": tick_id, "offset": offset, "data": data, "eof": eof}
+
+
+def rotate_tick_logs(name, keep=LOG_RETENTION_TICKS, log_dir=LOG_DIR):
+    """Delete all but the newest `keep` tick logs of a ledger."""
+    directory = ledger_log_dir(name, log_dir)
+    if not keep or not os.path.isdir(directory):
+        return
+    files = sorted(file_name for file_name in os.listdir(directory) if _TICK_FILE.match(file_name))
+    for file_name in files[:-keep]:
+        os.remove(os.path.join(directory, file_name))
+
+
+def delete_ledger_logs(name, log_dir=LOG_DIR):
+    shutil.rmtree(ledger_log_dir(name, log_dir), ignore_errors=True)
@@ -1,10 +1,15 @@
-from sqlalchemy import select
-from utils.db_config import get_db_connection, ledger
-from utils.tasks import run_ledger_trade
+from datetime import datetime
+
+from utils.ledger_registry import lookup_ledger
+from utils.ledger_state import CREATED, PAUSED, RUNNING, STOPPED, transition_ledger
+from utils.tasks import release_ledger, revoke_next_task, start_trade_cycle
+
 
 def start_ledger(name):
     """
     Starts a ledger instance.
+    A ledger that is already running (e.g. its trade cycle was lost in a worker crash) is
+    rescheduled from its persisted start time instead of being reset.
 
     Args:
         name (str): Name of the ledger to start.
@@ -13,18 +18,87 @@ def start_ledger(name):
         dict: A message indicating success or failure.
         int: HTTP status code.
     """
-    with get_db_connection() as conn:
-        stmt = select(
-            ledger.c.name,
-            ledger.c.update_time,
-            ledger.c.algo_link,
-            ledger.c.end_duration
-        ).where(ledger.c.name == name)
-        result = conn.execute(stmt).fetchone()
+    result = lookup_ledger(name)
+
+    if not result:
+        return {"Error": f"Ledger {name} does not exist."}, 404
+
+    if result.status == RUNNING and result.start_time is not None:
+        start_time = result.start_time
+    else:
+        start_time = datetime.now()
 
+    result = transition_ledger(name, {CREATED, STOPPED, RUNNING}, RUNNING, start_time=start_time)
     if not result:
+        return {"Error": f"Ledger {name} is paused. Use resume_ledger to continue it."}, 409
+
+    # make sure a recovered ledger does not end up with two trade cycles
+    revoke_next_task(name)
+    start_trade_cycle(result.name, result.update_time, result.end_duration, result.start_time, result.image)
+
+    return {"Info": f"Ledger {name} will now start"}, 202
+
+
+def pause_ledger(name):
+    """
+    Pauses a running ledger. Its pending trade cycle is revoked and its container stopped.
+
+    Args:
+        name (str): Name of the ledger to pause.
+
+    Returns:
+        dict: A message indicating success or failure.
+        int: HTTP status code.
+    """
+    if not lookup_ledger(name):
+        return {"Error": f"Ledger {name} does not exist."}, 404
+
+    if not transition_ledger(name, {RUNNING}, PAUSED):
+        return {"Error": f"Ledger {name} is not running."}, 409
+
+    release_ledger(name)
+    return {"Info": f"Ledger {name} has been paused"}, 200
+
+
+def resume_ledger(name):
+    """
+    Resumes a paused ledger from its persisted start time.
+
+    Args:
+        name (str): Name of the ledger to resume.
+
+    Returns:
+        dict: A message indicating success or failure.
+        int: HTTP status code.
+    """
+    if not lookup_ledger(name):
+        return {"Error": f"Ledger {name} does not exist."}, 404
+
+    result = transition_ledger(name, {PAUSED}, RUNNING)
+    if not result:
+        return {"Error": f"Ledger {name} is not paused."}, 409
+
+    start_trade_cycle(result.name, result.update_time, result.end_duration, result.start_time, result.image)
+    return {"Info": f"Ledger {name} will now resume"}, 202
+
+
+def stop_ledger(name):
+    """
+    Stops a running or paused ledger. Its pending trade cycle is revoked and its container stopped.
+    A stopped ledger keeps its history and can be started again with start_ledger.
+
+    Args:
+        name (str): Name of the ledger to stop.
+
+    Returns:
+        dict: A message indicating success or failure.
+        int: HTTP status code.
+    """
+    if not lookup_ledger(name):
         return {"Error": f"Ledger {name} does not exist."}, 404
 
-    run_ledger_trade(result.name, result.algo_link, result.update_time, result.end_duration)
+    if not transition_ledger(name, {RUNNING, PAUSED}, STOPPED):
+        return {"Error": f"Ledger {name} is not running or paused."}, 409
 
-    return {f"Ledger {name} will now start"}, 202
\ No newline at end of file
+    release_ledger(name)
+    return {"Info": f"Ledger {name} has been stopped"}, 200
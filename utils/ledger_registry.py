@@ -0,0 +1,209 @@
+"""
+In-process registry of ledger metadata.
+
+The registry is loaded in bulk from the ledger table on first use, so existence checks and
+config reads on the hot path (every Huey tick, start/delete requests) are dictionary lookups.
+It is kept coherent across API replicas and workers through Redis pub/sub: whenever a ledger
+is created, deleted or changes status, its name is published on REGISTRY_CHANNEL and every
+process drops its cached entry. A miss falls through to a single-row query, so a ledger
+created by another process is found even before its notification arrives. Each invalidation
+bumps a generation counter, and a query result is only cached if no invalidation of what it
+read arrived while it ran. While the subscription is down, nothing cached is trusted: lookups
+read the database directly and retry subscribing every LISTENER_RETRY_SECONDS.
+"""
+import json
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import select
+
+from utils.db_config import get_db_connection, ledger
+from utils.redis_utils import get_redis_client
+
+REGISTRY_CHANNEL = "ledger-registry"
+
+# how often lookups retry a failed subscription; until one succeeds they bypass the registry
+LISTENER_RETRY_SECONDS = 5
+
+LedgerInfo = namedtuple(
+    "LedgerInfo",
+    [
+        "name",
+        "tickers_to_track",
+        "algo_link",
+        "update_time",
+        "end_duration",
+        "status",
+        "start_time",
+        "image",
+    ],
+    defaults=(None,),
+)
+
+_REGISTRY_COLUMNS = [getattr(ledger.c, field) for field in LedgerInfo._fields]
+
+_registry = {}
+_loaded = False
+_lock = threading.Lock()
+_listener = None
+_listener_retry_at = 0
+
+# invalidations seen per ledger name, and of the whole registry
+_generations = {}
+_epoch = 0
+
+
+def _info_from_row(row):
+    return LedgerInfo(*(getattr(row, field) for field in LedgerInfo._fields))
+
+
+def load_registry():
+    """Bulk-load metadata for every ledger, replacing the current contents of the registry."""
+    global _loaded
+    # subscribed first, so nothing invalidated while loading is missed
+    start_registry_listener()
+    with _lock:
+        epoch, generations = _epoch, dict(_generations)
+
+    with get_db_connection() as conn:
+        rows = conn.execute(select(*_REGISTRY_COLUMNS)).fetchall()
+
+    with _lock:
+        # if the whole registry was invalidated while loading, the next lookup loads it again
+        if _epoch == epoch:
+            _registry.clear()
+            _registry.update({
+                row.name: _info_from_row(row) for row in rows
+                if _generations.get(row.name, 0) == generations.get(row.name, 0)
+            })
+            _loaded = True
+
+
+def invalidate_registry():
+    """Drop every cached entry. The next lookup reloads the registry in bulk."""
+    global _loaded, _epoch
+    with _lock:
+        _registry.clear()
+        _loaded = False
+        _epoch += 1
+
+
+def _invalidate(name):
+    with _lock:
+        _registry.pop(name, None)
+        _generations[name] = _generations.get(name, 0) + 1
+
+
+def lookup_ledger(name, conn=None):
+    """
+    Look up a ledger's metadata.
+
+    Args:
+        name (str): Name of the ledger.
+        conn: Optional open connection, reused for the fallback query on a cache miss.
+
+    Returns:
+        LedgerInfo: The ledger's metadata, or None if the ledger does not exist.
+    """
+    # cached entries are only trusted while invalidations are being received
+    if not _listening():
+        return _query_ledger(name, conn)
+
+    if not _loaded:
+        load_registry()
+
+    info = _registry.get(name)
+    if info is not None:
+        return info
+
+    with _lock:
+        epoch, generation = _epoch, _generations.get(name, 0)
+
+    info = _query_ledger(name, conn)
+    if info is None:
+        return None
+
+    with _lock:
+        # an invalidation that arrived during the query may be newer than the row we read
+        if _epoch == epoch and _generations.get(name, 0) == generation:
+            _registry[name] = info
+    return info
+
+
+def _query_ledger(name, conn=None):
+    stmt = select(*_REGISTRY_COLUMNS).where(ledger.c.name == name)
+    if conn is None:
+        with get_db_connection() as conn:
+            row = conn.execute(stmt).fetchone()
+    else:
+        row = conn.execute(stmt).fetchone()
+    return _info_from_row(row) if row else None
+
+
+def register_ledger(info):
+    """Cache a newly created ledger locally and notify other processes."""
+    with _lock:
+        _registry[info.name] = info
+    publish_invalidation(info.name)
+
+
+def unregister_ledger(name):
+    """Drop a deleted ledger locally and notify other processes."""
+    _invalidate(name)
+    publish_invalidation(name)
+
+
+def publish_invalidation(name):
+    try:
+        get_redis_client().publish(REGISTRY_CHANNEL, json.dumps({"name": name}))
+    except Exception as e:
+        print(f"Failed to publish registry invalidation for '{name}': {e}")
+
+
+def _handle_invalidation(message):
+    _invalidate(json.loads(message["data"])["name"])
+
+
+def _handle_listener_error(e, pubsub, thread):
+    # we may have missed notifications while disconnected, so nothing cached can be trusted
+    print(f"Ledger registry listener error: {e}")
+    invalidate_registry()
+
+
+def _listener_alive():
+    return _listener is not None and _listener.is_alive()
+
+
+def _listening():
+    """Whether invalidations are being received, retrying a failed subscription at most every LISTENER_RETRY_SECONDS."""
+    global _listener_retry_at
+    if _listener_alive():
+        return True
+    now = time.monotonic()
+    if now < _listener_retry_at:
+        return False
+    _listener_retry_at = now + LISTENER_RETRY_SECONDS
+    start_registry_listener()
+    if not _listener_alive():
+        return False
+    # entries cached before the subscription was lost may have missed their invalidations
+    invalidate_registry()
+    return True
+
+
+def start_registry_listener():
+    """Subscribe to registry invalidations on a background thread. Safe to call more than once."""
+    global _listener
+    with _lock:
+        if _listener_alive():
+            return
+        _listener = None
+        try:
+            pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{REGISTRY_CHANNEL: _handle_invalidation})
+            _listener = pubsub.run_in_thread(
+                sleep_time=1.0, daemon=True, exception_handler=_handle_listener_error
+            )
+        except Exception as e:
+            print(f"Failed to subscribe to ledger registry invalidations: {e}")
@@ -0,0 +1,51 @@
+"""
+Ledger lifecycle states.
+
+    created --start--> running --pause--> paused --resume--> running
+    running/paused --stop--> stopped --start--> running
+
+Transitions are compare-and-set updates on the status column, so two callers racing on the
+same ledger cannot both succeed. Every successful transition is pushed into the ledger
+registry, which notifies the scheduler in every other process.
+"""
+from sqlalchemy import update
+
+from utils.db_config import get_db_connection, ledger
+from utils.ledger_registry import LedgerInfo, register_ledger
+
+CREATED = "created"
+RUNNING = "running"
+PAUSED = "paused"
+STOPPED = "stopped"
+
+
+def transition_ledger(name, from_states, to_state, **values):
+    """
+    Move a ledger to `to_state` if it is currently in one of `from_states`.
+
+    Args:
+        name (str): Name of the ledger.
+        from_states (set): States the transition is allowed from.
+        to_state (str): Target state.
+        **values: Extra columns to persist alongside the new status (e.g. start_time).
+
+    Returns:
+        LedgerInfo: The ledger's updated metadata, or None if it does not exist or is not
+        in one of `from_states`.
+    """
+    stmt = (
+        update(ledger)
+        .where(ledger.c.name == name, ledger.c.status.in_(from_states))
+        .values(status=to_state, **values)
+        .returning(*[getattr(ledger.c, field) for field in LedgerInfo._fields])
+    )
+    with get_db_connection() as conn:
+        row = conn.execute(stmt).fetchone()
+        conn.commit()
+
+    if not row:
+        return None
+
+    info = LedgerInfo(*(getattr(row, field) for field in LedgerInfo._fields))
+    register_ledger(info)
+    return info
@@ -0,0 +1,140 @@
+"""
+Reads and writes of a ledger's state.
+
+Current holdings and balance live on the ledger row. Trade and value history are appended to
+the partitioned ledger_trades and ledger_values tables, so an update inserts a few small rows
+into the current month's partition instead of rewriting the ledger's whole history.
+Ledgers created before those tables existed keep their older history in the ledger row's
+trades/value columns; reads return it ahead of the partitioned history.
+"""
+from datetime import datetime
+
+from sqlalchemy import Text, cast, delete, func, insert, literal, select, tuple_, update
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by
+
+from utils.db_config import ledger, ledger_trades, ledger_values
+from utils.partitions import ensure_partitions
+
+# history rows deleted per transaction when purging a deleted ledger
+PURGE_BATCH_ROWS = 5000
+
+
+def _trade_history(name):
+    trades = func.jsonb_agg(
+        aggregate_order_by(ledger_trades.c.trade, ledger_trades.c.executed_at, ledger_trades.c.id)
+    )
+    return (
+        select(func.coalesce(trades, cast(literal("[]"), JSONB)))
+        .where(ledger_trades.c.ledger_name == name)
+        .scalar_subquery()
+    )
+
+
+def _value_history(name):
+    values = func.jsonb_object_agg(cast(ledger_values.c.recorded_at, Text), ledger_values.c.value)
+    return (
+        select(func.coalesce(values, cast(literal("{}"), JSONB)))
+        .where(ledger_values.c.ledger_name == name)
+        .scalar_subquery()
+    )
+
+
+def read_ledger(conn, name):
+    """
+    Read a ledger's trades, holding, value history and balance in a single query.
+
+    Returns:
+        Row: with `trades`, `holding`, `value` and `balance` attributes, or None if the ledger does not exist.
+    """
+    stmt = select(
+        func.coalesce(ledger.c.trades, cast(literal("[]"), JSONB)).op("||")(_trade_history(name)).label("trades"),
+        ledger.c.holding,
+        func.coalesce(ledger.c.value, cast(literal("{}"), JSONB)).op("||")(_value_history(name)).label("value"),
+        ledger.c.balance,
+    ).where(ledger.c.name == name)
+    return conn.execute(stmt).fetchone()
+
+
+def append_ledger_update(conn, name, timestamp, trades, holding, balance, value, tick_id=None):
+    """Append an update's trades and value point to the history tables and store the new holding and balance."""
+    ensure_partitions(conn, timestamp)
+
+    if trades:
+        conn.execute(insert(ledger_trades), [
+            {"ledger_name": name, "executed_at": timestamp, "tick_id": tick_id, "trade": trade}
+            for trade in trades
+        ])
+    conn.execute(insert(ledger_values).values(ledger_name=name, recorded_at=timestamp, value=value))
+    conn.execute(
+        update(ledger).where(ledger.c.name == name).values(holding=holding, balance=balance)
+    )
+
+
+def purge_ledger_history(conn, name, deleted_at, batch_rows=PURGE_BATCH_ROWS):
+    """
+    Delete the history of a deleted ledger, committing every `batch_rows` rows so no single delete
+    holds its locks or piles up WAL for long. A ledger's rows share every monthly partition with
+    other ledgers', so they cannot be dropped with a partition and are deleted by key instead.
+    Rows written after `deleted_at` belong to a newer ledger with the same name.
+
+    Returns:
+        int: Number of rows deleted.
+    """
+    trade_keys = tuple_(ledger_trades.c.id, ledger_trades.c.executed_at)
+    value_keys = tuple_(ledger_values.c.ledger_name, ledger_values.c.recorded_at)
+    statements = [
+        delete(ledger_trades).where(trade_keys.in_(
+            select(ledger_trades.c.id, ledger_trades.c.executed_at)
+            .where(ledger_trades.c.ledger_name == name, ledger_trades.c.executed_at <= deleted_at)
+            .limit(batch_rows)
+        )),
+        delete(ledger_values).where(value_keys.in_(
+            select(ledger_values.c.ledger_name, ledger_values.c.recorded_at)
+            .where(ledger_values.c.ledger_name == name, ledger_values.c.recorded_at <= deleted_at)
+            .limit(batch_rows)
+        )),
+    ]
+
+    purged = 0
+    for stmt in statements:
+        while True:
+            deleted = conn.execute(stmt).rowcount
+            conn.commit()
+            purged += deleted
+            if deleted < batch_rows:
+                break
+    return purged
+
+
+def image_in_use(conn, image):
+    """Whether any ledger runs an image with the same digest as registry reference `image`."""
+    digest = image.rsplit("@", 1)[-1]
+    return conn.execute(
+        select(ledger.c.name).where(ledger.c.image.endswith(f"@{digest}", autoescape=True)).limit(1)
+    ).fetchone() is not None
+
+
+def read_value_series(conn, name):
+    """
+    Read a ledger's value history as parallel lists, oldest first.
+
+    Returns:
+        tuple: (timestamps, values, balance), or None if the ledger does not exist.
+    """
+    row = conn.execute(
+        select(ledger.c.value, ledger.c.balance).where(ledger.c.name == name)
+    ).fetchone()
+    if not row:
+        return None
+
+    # history written before ledger_values existed is keyed by str(timestamp)
+    points = [(datetime.fromisoformat(ts), float(value)) for ts, value in (row.value or {}).items()]
+    rows = conn.execute(
+        select(ledger_values.c.recorded_at, ledger_values.c.value)
+        .where(ledger_values.c.ledger_name == name)
+        .order_by(ledger_values.c.recorded_at)
+    ).fetchall()
+    points.extend((recorded_at, float(value)) for recorded_at, value in rows)
+    points.sort(key=lambda point: point[0])
+
+    return [ts for ts, _ in points], [value for _, value in points], float(row.balance)
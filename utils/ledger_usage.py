@@ -0,0 +1,154 @@
+"""
+Per-ledger resource accounting.
+
+Trade cycles and update_ledger calls add their cost to per-day Redis hashes (USAGE_KEY), one
+field per ledger and metric, so /ledger_usage can rank ledgers by what they consume:
+    - ticks, tick_errors, tick_seconds: trade cycles run and their wall time
+    - cpu_seconds, memory_peak_bytes: container CPU time and peak memory, summed over ticks
+    - updates, update_seconds: update_ledger calls applied and their latency
+    - db_rows, db_bytes: rows and approximate payload bytes written by update_ledger
+    - quote_calls: per-ticker quote requests update_ledger made because the snapshot missed them
+Periodic valuation is left out; it costs the same for every running ledger.
+
+Set LEDGER_PROFILE_SAMPLE_RATE (e.g. 0.01) to profile that fraction of update_ledger calls.
+Profiles are written to LEDGER_PROFILE_DIR, by pyinstrument's sampling profiler if it is
+installed and by cProfile otherwise.
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from utils.json_utils import dumps_json
+from utils.lazy_imports import lazy_import
+from utils.redis_utils import get_redis_client
+
+pyinstrument = lazy_import("pyinstrument", optional=True)
+
+USAGE_KEY = "ledger-usage:{}"
+
+USAGE_RETENTION_DAYS = 35
+
+METRICS = [
+    "ticks",
+    "tick_errors",
+    "tick_seconds",
+    "cpu_seconds",
+    "memory_peak_bytes",
+    "updates",
+    "update_seconds",
+    "db_rows",
+    "db_bytes",
+    "quote_calls",
+]
+
+PROFILE_SAMPLE_RATE = float(os.environ.get("LEDGER_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.environ.get("LEDGER_PROFILE_DIR", "profiles")
+
+
+def _usage_key(day):
+    return USAGE_KEY.format(day.isoformat())
+
+
+def record_usage(name, **metrics):
+    """Add `metrics` (see METRICS) to today's usage of a ledger. Accounting never fails the caller."""
+    day = datetime.now(timezone.utc).date()
+    try:
+        pipeline = get_redis_client().pipeline(transaction=False)
+        for metric, amount in metrics.items():
+            if amount:
+                pipeline.hincrbyfloat(_usage_key(day), f"{name}:{metric}", amount)
+        pipeline.expire(_usage_key(day), USAGE_RETENTION_DAYS * 24 * 60 * 60)
+        pipeline.execute()
+    except Exception as e:
+        print(f"Failed to record usage of ledger '{name}': {e}")
+
+
+def update_writes(trades, holding, tick_id=None):
+    """Rows and approximate payload bytes written by one update_ledger call."""
+    # one row per trade, the value point and the ledger row itself, plus the applied-tick record
+    rows = len(trades) + 2 + (tick_id is not None)
+    payload = len(dumps_json(trades)) + len(dumps_json(holding))
+    return {"db_rows": rows, "db_bytes": payload}
+
+
+def usage_report(days=1, name=None, sort="tick_seconds", limit=20, today=None):
+    """
+    Usage of each ledger summed over the last `days` days (including today), most expensive first.
+
+    Returns:
+        list: One dict per ledger with its name, every metric in METRICS and the derived means.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    pipeline = get_redis_client().pipeline(transaction=False)
+    for offset in range(days):
+        pipeline.hgetall(_usage_key(today - timedelta(days=offset)))
+
+    totals = {}
+    for day in pipeline.execute():
+        for field, amount in day.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            ledger_name, metric = field.rsplit(":", 1)
+            if name is not None and ledger_name != name:
+                continue
+            usage = totals.setdefault(ledger_name, dict.fromkeys(METRICS, 0.0))
+            usage[metric] = usage.get(metric, 0.0) + float(amount)
+
+    report = []
+    for ledger_name, usage in totals.items():
+        ticks, updates = usage["ticks"], usage["updates"]
+        report.append({
+            "name": ledger_name,
+            **usage,
+            "mean_tick_seconds": usage["tick_seconds"] / ticks if ticks else None,
+            "mean_memory_peak_bytes": usage["memory_peak_bytes"] / ticks if ticks else None,
+            "mean_update_seconds": usage["update_seconds"] / updates if updates else None,
+        })
+    report.sort(key=lambda usage: usage.get(sort) or 0, reverse=True)
+    return report[:limit]
+
+
+@contextmanager
+def profile_update(name):
+    """Profile the enclosed block for a sampled fraction (PROFILE_SAMPLE_RATE) of calls and save the profile."""
+    if not PROFILE_SAMPLE_RATE or random.random() >= PROFILE_SAMPLE_RATE:
+        yield
+        return
+
+    if pyinstrument is not None:
+        profiler = pyinstrument.Profiler(interval=0.001)
+        start, stop = profiler.start, profiler.stop
+    else:
+        profiler = cProfile.Profile()
+        start, stop = profiler.enable, profiler.disable
+
+    started = datetime.now(timezone.utc)
+    start()
+    try:
+        yield
+    finally:
+        stop()
+        _save_profile(name, started, profiler)
+
+
+def _save_profile(name, started, profiler):
+    if pyinstrument is not None:
+        text = profiler.output_text()
+    else:
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(40)
+        text = stream.getvalue()
+
+    # ledger names come from requests, so keep them from escaping the profile directory
+    safe_name = re.sub(r"[^\w.-]", "_", str(name))
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"update-{safe_name}-{started:%Y%m%dT%H%M%S%f}.txt")
+        with open(path, "w") as profile_file:
+            profile_file.write(text)
+    except OSError as e:
+        print(f"Failed to save profile of ledger '{name}': {e}")
@@ -1,4 +1,6 @@
-import yfinance as yf
+from utils.lazy_imports import lazy_import
+
+yf = lazy_import("yfinance")
 
 def calculate_new_balance(current_balance, new_trades):
     """Calculate new balance based on trades"""
@@ -19,15 +21,35 @@ def get_current_price(ticker):
         print(f"Error fetching price for {ticker}: {e}")
         raise RuntimeError(f"Failed to get current price for {ticker}")
 
-def calculate_total_value(holdings, balance):
-    """Helper function to calculate total portfolio value"""
+def get_current_prices(tickers):
+    """Helper function to get the latest prices of several tickers with a single yfinance request"""
+    if not tickers:
+        return {}
+    try:
+        data = yf.download(
+            list(tickers), period="1d", interval="1m", progress=False, multi_level_index=True
+        )
+        closes = data["Close"].ffill().iloc[-1]
+        return {ticker: float(price) for ticker, price in closes.items() if price == price}
+    except Exception as e:
+        print(f"Error fetching prices for {', '.join(tickers)}: {e}")
+        raise RuntimeError("Failed to get current prices")
+
+def calculate_total_value(holdings, balance, prices=None):
+    """
+    Helper function to calculate total portfolio value.
+    Prices found in `prices` (e.g. the latest quote snapshot) are used instead of fetching them.
+    """
     if not holdings:
         return balance
 
+    prices = prices or {}
     stock_value = 0
     for ticker, quantity in holdings.items():
         try:
-            current_price = get_current_price(ticker)
+            current_price = prices.get(ticker)
+            if current_price is None:
+                current_price = get_current_price(ticker)
             stock_value += quantity * current_price
         except Exception as e:
             print(f"Error calculating value for {ticker}: {e}")
@@ -0,0 +1,206 @@
+"""
+Monthly range partitions for the trade and value history tables.
+
+Writes only touch the current month's partition, so their cost stays flat as history grows.
+Partitions are created on demand (and a month ahead by the maintenance task). Partitions older
+than the retention period are exported to zstd-compressed Parquet files under ARCHIVE_DIR,
+then detached and dropped, which is a metadata operation rather than a large delete.
+Setting LEDGER_HASH_PARTITIONS splits each month further by a hash of the ledger name.
+"""
+import json
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from utils.db_config import ledger_trades, ledger_values
+from utils.lazy_imports import lazy_import
+
+pyarrow = lazy_import("pyarrow", optional=True)
+
+# table name -> partition column
+PARTITIONED_TABLES = {
+    ledger_trades.name: "executed_at",
+    ledger_values.name: "recorded_at",
+}
+
+# number of hash sub-partitions per month; 0 disables hash sub-partitioning
+LEDGER_HASH_PARTITIONS = int(os.environ.get("LEDGER_HASH_PARTITIONS", "0"))
+
+ARCHIVE_DIR = "archive"
+
+# rows read from a partition and written to its Parquet file at a time
+EXPORT_BATCH_ROWS = 50000
+
+# how long a detach may wait for its lock on the parent table
+DETACH_LOCK_TIMEOUT = "5s"
+
+# partitions known to exist, so the hot path skips the DDL; names are added once their DDL commits
+_created = set()
+
+
+def month_start(ts):
+    return datetime(ts.year, ts.month, 1, tzinfo=timezone.utc)
+
+
+def next_month(ts):
+    if ts.month == 12:
+        return datetime(ts.year + 1, 1, 1, tzinfo=timezone.utc)
+    return datetime(ts.year, ts.month + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(table, ts):
+    return f"{table}_{ts.year:04d}_{ts.month:02d}"
+
+
+def ensure_partitions(conn, ts):
+    """Create the partitions of every history table covering timestamp `ts`, if missing."""
+    start = month_start(ts.astimezone(timezone.utc) if ts.tzinfo else ts)
+    end = next_month(start)
+
+    created = []
+    for table in PARTITIONED_TABLES:
+        name = partition_name(table, start)
+        if name in _created:
+            continue
+
+        sub_partitioning = " PARTITION BY HASH (ledger_name)" if LEDGER_HASH_PARTITIONS else ""
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}'){sub_partitioning}"
+        ))
+        for remainder in range(LEDGER_HASH_PARTITIONS):
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name}_h{remainder} PARTITION OF {name} "
+                f"FOR VALUES WITH (MODULUS {LEDGER_HASH_PARTITIONS}, REMAINDER {remainder})"
+            ))
+        created.append(name)
+
+    if created:
+        _cache_on_commit(conn, created)
+
+
+def _cache_on_commit(conn, names):
+    # a rolled-back transaction takes the DDL with it, and a cached name would then skip it for good
+    transaction = {"open": True}
+
+    def on_commit(conn):
+        if transaction["open"]:
+            _created.update(names)
+        transaction["open"] = False
+
+    def on_rollback(conn):
+        transaction["open"] = False
+
+    event.listen(conn, "commit", on_commit, once=True)
+    event.listen(conn, "rollback", on_rollback, once=True)
+
+
+def list_partitions(conn, table):
+    """Names of the monthly partitions of `table`, oldest first."""
+    rows = conn.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+        "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+        "WHERE parent.relname = :table"
+    ), {"table": table}).fetchall()
+    return sorted(row[0] for row in rows)
+
+
+def partition_month(name):
+    year, month = name.rsplit("_", 2)[-2:]
+    return datetime(int(year), int(month), 1, tzinfo=timezone.utc)
+
+
+def _parquet_schema(table):
+    types = {
+        "id": pyarrow.int64(),
+        "executed_at": pyarrow.timestamp("us", tz="UTC"),
+        "recorded_at": pyarrow.timestamp("us", tz="UTC"),
+        "value": pyarrow.float64(),
+    }
+    return pyarrow.schema([(column.name, types.get(column.name, pyarrow.string())) for column in table.columns])
+
+
+def export_partition(conn, table, name, archive_dir=ARCHIVE_DIR):
+    """
+    Write every row of a partition of `table` to a zstd-compressed Parquet file.
+    Rows are read through a server-side cursor and written one row group per EXPORT_BATCH_ROWS rows.
+
+    Returns:
+        tuple: Path of the file written, and the number of rows in it.
+    """
+    if pyarrow is None:
+        raise RuntimeError("pyarrow is required to archive partitions")
+    import pyarrow.parquet
+
+    schema = _parquet_schema(table)
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.parquet")
+
+    result = conn.execute(
+        text(f"SELECT {', '.join(schema.names)} FROM {name}")
+        .execution_options(stream_results=True, yield_per=EXPORT_BATCH_ROWS)
+    )
+    rows = 0
+    with pyarrow.parquet.ParquetWriter(path, schema, compression="zstd") as writer:
+        for chunk in result.partitions():
+            columns = {column: [_to_parquet_value(row[i]) for row in chunk] for i, column in enumerate(schema.names)}
+            writer.write_table(pyarrow.table(columns, schema=schema))
+            rows += len(chunk)
+    return path, rows
+
+
+def _to_parquet_value(value):
+    # JSONB trades and NUMERIC values have no direct Parquet type
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=float)
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def archive_partitions(conn, before, archive_dir=ARCHIVE_DIR):
+    """
+    Export, detach and drop every monthly partition that ends on or before `before`.
+
+    A partition is exported while still attached, so the parent table is only locked for the
+    detach itself. A detach that cannot get its lock within DETACH_LOCK_TIMEOUT is left for the
+    next run.
+
+    Returns:
+        list: Paths of the Parquet files written.
+    """
+    if pyarrow is None:
+        print("Warning: pyarrow is not installed, so partitions past the retention period are kept. Install pyarrow to archive them.")
+        return []
+
+    archived = []
+    for table in (ledger_trades, ledger_values):
+        for name in list_partitions(conn, table.name):
+            if next_month(partition_month(name)) > before:
+                continue
+            path, rows = export_partition(conn, table, name, archive_dir)
+            conn.commit()
+
+            try:
+                conn.execute(text(f"SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT}'"))
+                conn.execute(text(f"ALTER TABLE {table.name} DETACH PARTITION {name}"))
+                conn.commit()
+            except OperationalError as e:
+                conn.rollback()
+                print(f"Skipped archiving partition {name}, it could not be detached: {e}")
+                continue
+
+            # rows restored into the month after the export are in the detached table; export it again
+            if conn.execute(text(f"SELECT count(*) FROM {name}")).scalar() != rows:
+                path, rows = export_partition(conn, table, name, archive_dir)
+
+            conn.execute(text(f"DROP TABLE {name}"))
+            _created.discard(name)
+            conn.commit()
+            archived.append(path)
+            print(f"Archived partition {name} ({rows} rows) to {path}")
+    return archived
@@ -0,0 +1,236 @@
+"""
+Quote fan-out for model containers.
+
+One feed per host polls a quote provider for the union of tickers tracked by running ledgers
+(only the ledgers this node owns, when LEDGER_WORKER_NODE is set), and broadcasts every snapshot
+over a Unix socket as one line of JSON:
+
+    {"timestamp": "2026-10-19T14:30:00+00:00", "quotes": {"AAPL": 187.1, "GOOG": 164.2}}
+
+Trade containers get the socket mounted at CONTAINER_QUOTE_SOCKET. A client may send one line of
+comma-separated tickers after connecting to receive only those (an empty line for all of them).
+It then gets the latest snapshot right away and every new one as it is published. Providers that
+only quote during market hours are still polled until the first snapshot, so clients connecting
+while the market is closed get the last prices. Clients that cannot take a snapshot within
+SEND_TIMEOUT_SECONDS are dropped.
+"""
+import json
+import os
+import random
+import socket
+import socketserver
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from utils.db_config import get_db_connection, ledger
+from utils.ledger_state import RUNNING
+from utils.ledger_utils import get_current_prices
+from utils.sharding import node_for_ledger
+from utils.valuation import is_market_open
+
+QUOTE_SOCKET = os.environ.get("LEDGER_QUOTE_SOCKET", "/run/ledger-quotes/quotes.sock")
+
+# where the socket's directory is mounted inside trade containers
+CONTAINER_QUOTE_DIR = "/run/ledger-quotes"
+CONTAINER_QUOTE_SOCKET = f"{CONTAINER_QUOTE_DIR}/{os.path.basename(QUOTE_SOCKET)}"
+
+QUOTE_INTERVAL_SECONDS = int(os.environ.get("LEDGER_QUOTE_INTERVAL_SECONDS", "60"))
+
+SUBSCRIBE_TIMEOUT_SECONDS = 2.0
+SEND_TIMEOUT_SECONDS = 1.0
+
+
+def container_quote_volumes():
+    """Docker volume binding that exposes the quote socket to a trade container, or None if no feed runs on this host."""
+    if not os.path.exists(QUOTE_SOCKET):
+        return None
+    return {os.path.dirname(QUOTE_SOCKET): {"bind": CONTAINER_QUOTE_DIR, "mode": "rw"}}
+
+
+class YFinanceProvider:
+    """Latest one-minute closes from yfinance, one request per poll for all tickers."""
+
+    market_hours_only = True
+
+    def fetch(self, tickers):
+        return get_current_prices(tickers)
+
+
+class SyntheticProvider:
+    """Deterministic random walk per ticker, for tests and for running without market data."""
+
+    market_hours_only = False
+
+    def __init__(self, seed=0, start=100.0, volatility=0.001):
+        self._random = random.Random(seed)
+        self._start = start
+        self._volatility = volatility
+        self._prices = {}
+
+    def fetch(self, tickers):
+        for ticker in tickers:
+            price = self._prices.get(ticker, self._start)
+            self._prices[ticker] = price * (1 + self._random.gauss(0, self._volatility))
+        return {ticker: round(self._prices[ticker], 4) for ticker in tickers}
+
+
+PROVIDERS = {"yfinance": YFinanceProvider, "synthetic": SyntheticProvider}
+
+
+def get_provider(name=None):
+    """The quote provider named `name`, or by LEDGER_QUOTE_PROVIDER (default yfinance)."""
+    name = name or os.environ.get("LEDGER_QUOTE_PROVIDER", "yfinance")
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown quote provider '{name}'. Choose one of {', '.join(PROVIDERS)}")
+    return PROVIDERS[name]()
+
+
+def tracked_tickers(node=None):
+    """Union of the tickers tracked by running ledgers, restricted to the ledgers owned by `node` if given."""
+    with get_db_connection(readonly=True) as conn:
+        rows = conn.execute(
+            select(ledger.c.name, ledger.c.tickers_to_track).where(ledger.c.status == RUNNING)
+        ).fetchall()
+
+    tickers = set()
+    for row in rows:
+        if node is not None and node_for_ledger(row.name) != node:
+            continue
+        tickers.update(ticker.strip() for ticker in row.tickers_to_track or [] if ticker and ticker.strip())
+    return sorted(tickers)
+
+
+class _SubscriberHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        feed = self.server.feed
+        self.connection.settimeout(SUBSCRIBE_TIMEOUT_SECONDS)
+        try:
+            line = self.rfile.readline()
+        except OSError:
+            line = b""
+        tickers = {ticker.strip() for ticker in line.decode(errors="replace").split(",") if ticker.strip()}
+
+        self.connection.settimeout(SEND_TIMEOUT_SECONDS)
+        feed.subscribe(self.connection, tickers or None)
+        try:
+            # snapshots are sent by the feed; this thread only waits for the client to disconnect
+            while True:
+                try:
+                    if not self.connection.recv(1024):
+                        break
+                except socket.timeout:
+                    continue
+        except OSError:
+            pass
+        finally:
+            feed.unsubscribe(self.connection)
+
+
+class QuoteFeed:
+    """
+    Polls `provider` every `interval` seconds and broadcasts the quotes to subscribers on `socket_path`.
+    Call start() to accept subscribers, then poll() for each snapshot, or run() to do both until interrupted.
+    """
+
+    def __init__(self, provider, socket_path=QUOTE_SOCKET, interval=QUOTE_INTERVAL_SECONDS, node=None):
+        self.provider = provider
+        self.socket_path = socket_path
+        self.interval = interval
+        self.node = node
+        self._subscribers = {}
+        self._latest = None
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, _SubscriberHandler)
+        self._server.daemon_threads = True
+        self._server.feed = self
+        # containers may run as any user
+        os.chmod(self.socket_path, 0o666)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    def subscribe(self, connection, tickers=None):
+        # holding the send lock keeps a newer snapshot from overtaking the initial one
+        with self._send_lock:
+            with self._lock:
+                self._subscribers[connection] = tickers
+                latest = self._latest
+            if latest is not None:
+                self._send(connection, tickers, latest)
+
+    def unsubscribe(self, connection):
+        with self._lock:
+            self._subscribers.pop(connection, None)
+
+    def publish(self, timestamp, quotes):
+        """Send a snapshot to every subscriber and keep it for the ones that connect later."""
+        snapshot = {"timestamp": timestamp.isoformat(), "quotes": quotes}
+        with self._send_lock:
+            with self._lock:
+                self._latest = snapshot
+                subscribers = list(self._subscribers.items())
+            for connection, tickers in subscribers:
+                self._send(connection, tickers, snapshot)
+
+    def _send(self, connection, tickers, snapshot):
+        if tickers is not None:
+            snapshot = {
+                "timestamp": snapshot["timestamp"],
+                "quotes": {ticker: price for ticker, price in snapshot["quotes"].items() if ticker in tickers},
+            }
+        line = (json.dumps(snapshot) + "\n").encode()
+        try:
+            connection.sendall(line)
+        except OSError:
+            # a client that can't keep up is dropped; waking its handler thread ends the connection
+            self.unsubscribe(connection)
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def poll(self, now=None):
+        """Fetch and publish one snapshot of the tracked tickers. Returns the quotes."""
+        tickers = tracked_tickers(self.node)
+        if not tickers:
+            return {}
+        quotes = self.provider.fetch(tickers)
+        if quotes:
+            self.publish(now or datetime.now(timezone.utc), quotes)
+        return quotes
+
+    def _should_poll(self, now):
+        # outside market hours, poll until there is a snapshot to send to clients that connect overnight
+        return self._latest is None or not self.provider.market_hours_only or is_market_open(now)
+
+    def run(self):
+        self.start()
+        print(f"Publishing quotes on {self.socket_path} every {self.interval}s")
+        try:
+            while True:
+                started = time.monotonic()
+                if self._should_poll(datetime.now(timezone.utc)):
+                    try:
+                        self.poll()
+                    except Exception as e:
+                        print(f"Failed to publish quotes: {e}")
+                time.sleep(max(self.interval - (time.monotonic() - started), 0))
+        finally:
+            self.close()
@@ -0,0 +1,13 @@
+import redis
+
+REDIS_HOST = "localhost"
+REDIS_PORT = 6379
+
+_redis_client = None
+
+
+def get_redis_client():
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT)
+    return _redis_client
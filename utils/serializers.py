@@ -0,0 +1,92 @@
+"""
+Response serialization shared by every endpoint.
+
+JSON is encoded with orjson, which handles datetimes natively; Decimal balances are encoded as
+numbers. Clients can ask for other formats through the Accept header:
+    - application/msgpack: the same payload as MessagePack (requires `msgpack`)
+    - application/vnd.apache.arrow.stream: a value series as an Arrow IPC stream with
+      `timestamp` and `value` columns, for endpoints that return one (requires `pyarrow`)
+Large bodies are compressed with zstd (requires `zstandard`) or gzip, following Accept-Encoding.
+The optional formats are only offered when their package is installed.
+"""
+import gzip
+
+from flask import Response, request
+
+from utils.json_utils import _default, dumps_json
+from utils.lazy_imports import lazy_import
+
+msgpack = lazy_import("msgpack", optional=True)
+pyarrow = lazy_import("pyarrow", optional=True)
+zstandard = lazy_import("zstandard", optional=True)
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+# bodies smaller than this are sent uncompressed
+COMPRESSION_THRESHOLD = 8 * 1024
+
+
+def dumps_msgpack(payload):
+    return msgpack.packb(payload, default=_default)
+
+
+def dumps_arrow(series):
+    """Encode a {timestamp: value} series as an Arrow IPC stream."""
+    table = pyarrow.table({
+        "timestamp": pyarrow.array([str(ts) for ts in series], type=pyarrow.string()),
+        "value": pyarrow.array([float(v) for v in series.values()], type=pyarrow.float64()),
+    })
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _compress(body):
+    """Compress a body according to Accept-Encoding. Returns the body and its content encoding."""
+    if len(body) < COMPRESSION_THRESHOLD:
+        return body, None
+    accepted = request.accept_encodings
+    if zstandard is not None and accepted["zstd"]:
+        return zstandard.ZstdCompressor().compress(body), "zstd"
+    if accepted["gzip"]:
+        return gzip.compress(body, compresslevel=5), "gzip"
+    return body, None
+
+
+def serialize_response(payload, status=200, series_key=None):
+    """
+    Build a response for the current request.
+
+    Args:
+        payload: The response body as plain Python data.
+        status (int): HTTP status code.
+        series_key (str): Key of a {timestamp: value} series in the payload that can be served as Arrow.
+
+    Returns:
+        Response: The serialized, and possibly compressed, response.
+    """
+    offered = [JSON_MIMETYPE]
+    if msgpack is not None:
+        offered.append(MSGPACK_MIMETYPE)
+    if pyarrow is not None and series_key is not None and status == 200:
+        offered.append(ARROW_MIMETYPE)
+
+    mimetype = request.accept_mimetypes.best_match(offered, default=JSON_MIMETYPE)
+    if mimetype == MSGPACK_MIMETYPE:
+        body = dumps_msgpack(payload)
+    elif mimetype == ARROW_MIMETYPE:
+        body = dumps_arrow(payload[series_key])
+    else:
+        body = dumps_json(payload)
+
+    body, encoding = _compress(body)
+
+    response = Response(body, status=status, mimetype=mimetype)
+    response.vary.add("Accept")
+    response.vary.add("Accept-Encoding")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    return response
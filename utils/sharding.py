@@ -0,0 +1,106 @@
+"""
+Placement of ledgers on Huey worker nodes.
+
+Each worker started with LEDGER_WORKER_NODE set consumes its own queue and heartbeats into the
+WORKERS_KEY sorted set (score = time of last heartbeat). Ledgers are assigned to live nodes with a
+consistent hash ring, so a ledger's ticks keep running on the node that already holds its image,
+and only about 1/N of the ledgers move when a node joins or leaves. With no live nodes, every
+ledger falls back to the shared default queue.
+"""
+import bisect
+import hashlib
+import time
+
+from utils.redis_utils import get_redis_client
+
+WORKERS_KEY = "ledger-workers"
+
+# a node that has not heartbeated for this long is considered gone
+NODE_TTL_SECONDS = 180
+
+# how often a worker node heartbeats, from a thread independent of its task workers
+HEARTBEAT_INTERVAL_SECONDS = 30
+
+# how long a node has to move a departed node's queue before another node may try
+CLAIM_KEY = "ledger-worker-claim:{}"
+CLAIM_TTL_SECONDS = 600
+
+# points per node on the ring; more points spread ledgers more evenly
+VIRTUAL_NODES = 64
+
+# how often a process re-reads the set of live nodes
+RING_REFRESH_SECONDS = 10
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring over worker node ids."""
+
+    def __init__(self, nodes, virtual_nodes=VIRTUAL_NODES):
+        self.nodes = frozenset(nodes)
+        points = sorted(
+            (_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(virtual_nodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, key):
+        """Return the node owning `key`, or None if the ring is empty."""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+_ring = HashRing([])
+_ring_refreshed_at = 0
+
+
+def heartbeat(node):
+    """Mark `node` as alive."""
+    get_redis_client().zadd(WORKERS_KEY, {node: time.time()})
+
+
+def live_nodes():
+    cutoff = time.time() - NODE_TTL_SECONDS
+    return sorted(node.decode("utf-8") for node in get_redis_client().zrangebyscore(WORKERS_KEY, cutoff, "+inf"))
+
+
+def departed_nodes():
+    cutoff = time.time() - NODE_TTL_SECONDS
+    return sorted(node.decode("utf-8") for node in get_redis_client().zrangebyscore(WORKERS_KEY, "-inf", f"({cutoff}"))
+
+
+def claim_departed_node(node, claimant):
+    """
+    Claim a departed node's queue for `claimant` to take over. Only one caller succeeds; once it has moved
+    the queue it calls forget_node, and if it fails the claim expires after CLAIM_TTL_SECONDS.
+    """
+    return bool(get_redis_client().set(CLAIM_KEY.format(node), claimant, nx=True, ex=CLAIM_TTL_SECONDS))
+
+
+def forget_node(node):
+    """Remove a departed node, whose queue has been taken over, from the membership set."""
+    client = get_redis_client()
+    client.zrem(WORKERS_KEY, node)
+    client.delete(CLAIM_KEY.format(node))
+
+
+def get_ring(refresh=False):
+    """The hash ring over live nodes, re-read at most every RING_REFRESH_SECONDS unless `refresh` is set."""
+    global _ring, _ring_refreshed_at
+    now = time.time()
+    if refresh or now - _ring_refreshed_at > RING_REFRESH_SECONDS:
+        nodes = live_nodes()
+        if frozenset(nodes) != _ring.nodes:
+            _ring = HashRing(nodes)
+        _ring_refreshed_at = now
+    return _ring
+
+
+def node_for_ledger(name):
+    """Worker node that should run ledger `name`, or None to use the default queue."""
+    return get_ring().node_for(name)
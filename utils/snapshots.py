@@ -0,0 +1,188 @@
+"""
+Ledger snapshots.
+
+A snapshot is a self-contained copy of one ledger: its config, positions and cash, trade log and
+value series. It is a gzip-compressed stream of JSON lines, written and restored a chunk at a time,
+so neither side holds the ledger's history in memory:
+
+    {"format": "ledger-snapshot", "version": 1, "exported_at": ..., "ledger": {config, holding, balance}}
+    {"legacy": {"trades": [...], "value": {...}}}       history kept on the ledger row (older ledgers only)
+    {"trades": [[executed_at, tick_id, trade], ...]}    up to CHUNK_ROWS per line, oldest first
+    {"values": [[recorded_at, value], ...]}             up to CHUNK_ROWS per line, oldest first
+    {"end": {"trades": <count>, "values": <count>}}
+
+A restore inserts each chunk with one multi-row statement, in a single transaction. It fails
+without writing anything if the end line is missing or its counts disagree (a truncated upload).
+Restored ledgers start out created rather than running, so a fork never trades alongside its source.
+The NUMERIC balance and values are written as decimal strings, so they restore without float rounding.
+"""
+import gzip
+import json
+import zlib
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import insert, select, update
+
+from utils.db_config import ledger, ledger_trades, ledger_values
+from utils.json_utils import dumps_json
+from utils.ledger_registry import LedgerInfo
+from utils.ledger_state import CREATED
+from utils.partitions import ensure_partitions
+
+SNAPSHOT_FORMAT = "ledger-snapshot"
+SNAPSHOT_VERSION = 1
+
+CHUNK_ROWS = 5000
+
+LEDGER_FIELDS = [
+    "name",
+    "tickers_to_track",
+    "algo_link",
+    "update_time",
+    "end_duration",
+    "image",
+    "created_at",
+    "holding",
+    "balance",
+]
+
+
+def snapshot_records(conn, name):
+    """Records of a ledger's snapshot, oldest history first. Raises ValueError if the ledger does not exist."""
+    # one consistent view of the ledger row and both history tables
+    conn = conn.execution_options(isolation_level="REPEATABLE READ")
+
+    row = conn.execute(
+        select(*[getattr(ledger.c, field) for field in LEDGER_FIELDS], ledger.c.trades, ledger.c.value)
+        .where(ledger.c.name == name)
+    ).fetchone()
+    if row is None:
+        raise ValueError(f"Ledger '{name}' does not exist")
+
+    yield {
+        "format": SNAPSHOT_FORMAT,
+        "version": SNAPSHOT_VERSION,
+        "exported_at": datetime.now(timezone.utc),
+        "ledger": {field: getattr(row, field) for field in LEDGER_FIELDS},
+    }
+    if row.trades or row.value:
+        yield {"legacy": {"trades": row.trades or [], "value": row.value or {}}}
+
+    counts = {"trades": 0, "values": 0}
+
+    # history is read through server-side cursors, CHUNK_ROWS rows at a time
+    trades = conn.execute(
+        select(ledger_trades.c.executed_at, ledger_trades.c.tick_id, ledger_trades.c.trade)
+        .where(ledger_trades.c.ledger_name == name)
+        .order_by(ledger_trades.c.executed_at, ledger_trades.c.id)
+        .execution_options(stream_results=True, yield_per=CHUNK_ROWS)
+    )
+    for chunk in trades.partitions():
+        counts["trades"] += len(chunk)
+        yield {"trades": [list(trade) for trade in chunk]}
+
+    values = conn.execute(
+        select(ledger_values.c.recorded_at, ledger_values.c.value)
+        .where(ledger_values.c.ledger_name == name)
+        .order_by(ledger_values.c.recorded_at)
+        .execution_options(stream_results=True, yield_per=CHUNK_ROWS)
+    )
+    for chunk in values.partitions():
+        counts["values"] += len(chunk)
+        yield {"values": [list(value) for value in chunk]}
+
+    yield {"end": counts}
+
+
+def encode_snapshot(records):
+    """Encode snapshot records as a gzip stream of JSON lines, yielding compressed bytes as they are produced."""
+    # wbits=31 writes a gzip header, so the output is readable with gunzip
+    compressor = zlib.compressobj(wbits=31)
+    for record in records:
+        chunk = compressor.compress(dumps_json(record) + b"\n")
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+def decode_snapshot(stream):
+    """Records of a snapshot, read incrementally from a binary file-like object."""
+    with gzip.GzipFile(fileobj=stream, mode="rb") as lines:
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _parse_decimal(value):
+    # snapshots written before decimals were kept as strings hold floats
+    return Decimal(value) if isinstance(value, str) else value
+
+
+def _ensure_months(conn, timestamps):
+    for month in {(ts.year, ts.month) for ts in timestamps}:
+        ensure_partitions(conn, datetime(*month, 1, tzinfo=timezone.utc))
+
+
+def restore_snapshot(conn, records, name=None):
+    """
+    Restore a ledger from snapshot records, under `name` if given (a fork) or its original name.
+    The caller commits. Raises ValueError for an unreadable, unsupported or truncated snapshot.
+
+    Returns:
+        tuple: The restored ledger's LedgerInfo, and the number of trades and values restored.
+    """
+    records = iter(records)
+    header = next(records, None)
+    if not isinstance(header, dict) or header.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError("Not a ledger snapshot")
+    if header.get("version", 0) > SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot version {header['version']} is newer than the supported version {SNAPSHOT_VERSION}")
+
+    source = header["ledger"]
+    name = name or source["name"]
+    values = {field: source.get(field) for field in LEDGER_FIELDS if field != "name"}
+    values["created_at"] = _parse_time(values["created_at"]) if name == source["name"] else None
+    values["balance"] = _parse_decimal(values["balance"])
+    values = {field: value for field, value in values.items() if value is not None}
+    conn.execute(insert(ledger).values(name=name, status=CREATED, **values))
+
+    counts = {"trades": 0, "values": 0}
+    end = None
+    for record in records:
+        if "legacy" in record:
+            conn.execute(update(ledger).where(ledger.c.name == name).values(
+                trades=record["legacy"]["trades"], value=record["legacy"]["value"]
+            ))
+        elif "trades" in record:
+            rows = [
+                {"ledger_name": name, "executed_at": _parse_time(executed_at), "tick_id": tick_id, "trade": trade}
+                for executed_at, tick_id, trade in record["trades"]
+            ]
+            _ensure_months(conn, [row["executed_at"] for row in rows])
+            conn.execute(insert(ledger_trades), rows)
+            counts["trades"] += len(rows)
+        elif "values" in record:
+            rows = [
+                {"ledger_name": name, "recorded_at": _parse_time(recorded_at), "value": _parse_decimal(value)}
+                for recorded_at, value in record["values"]
+            ]
+            _ensure_months(conn, [row["recorded_at"] for row in rows])
+            conn.execute(insert(ledger_values), rows)
+            counts["values"] += len(rows)
+        elif "end" in record:
+            end = record["end"]
+            break
+
+    if end != counts:
+        raise ValueError(f"Snapshot is truncated: expected {end}, read {counts}")
+
+    info = LedgerInfo(
+        name, source["tickers_to_track"], source["algo_link"], source["update_time"], source["end_duration"],
+        CREATED, None, source.get("image"),
+    )
+    return info, counts
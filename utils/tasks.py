@@ -1,16 +1,190 @@
+import json
+import os
+import threading
 import time
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
 
-from utils.db_config import get_db_connection, ledger
-from utils.docker_utils import run_docker_container, stop_docker_container
-from huey import RedisHuey
-from sqlalchemy import select, update
+from utils.db_config import get_db_connection, ledger_ticks
+from utils.ledger_store import image_in_use, purge_ledger_history
+from utils.partitions import archive_partitions, ensure_partitions, month_start, next_month
+from utils.docker_utils import (
+    delete_registry_image, ensure_docker_image, ledger_container_name, remove_docker_image, stop_docker_container,
+    stream_docker_container,
+)
+from utils.quote_feed import CONTAINER_QUOTE_SOCKET, container_quote_volumes
+from utils.ledger_usage import record_usage
+from utils.ledger_logs import TickLogWriter, delete_ledger_logs, rotate_tick_logs
+from utils.ledger_registry import lookup_ledger
+from utils.ledger_state import RUNNING, STOPPED, transition_ledger
+from utils.redis_utils import REDIS_HOST, REDIS_PORT, get_redis_client
+from utils.valuation import VALUATION_INTERVAL_MINUTES, is_market_open, revalue_ledgers
+from utils.sharding import (
+    HEARTBEAT_INTERVAL_SECONDS, claim_departed_node, departed_nodes, forget_node, get_ring, heartbeat, node_for_ledger,
+)
+from huey import RedisHuey, crontab
+from sqlalchemy.dialects.postgresql import insert
 
-huey = RedisHuey('ledger-tasks', host='localhost', port=6379)
+# worker node this process consumes for; unset for the API and for a single shared worker
+NODE_ID = os.environ.get("LEDGER_WORKER_NODE")
 
 
-@huey.task()
-def execute_trade_cycle(name, image_path, update_time, end_duration, start_time):
+def queue_name(node):
+    return f"ledger-tasks-{node}" if node else "ledger-tasks"
+
+
+huey = RedisHuey(queue_name(NODE_ID), host=REDIS_HOST, port=REDIS_PORT)
+
+# queue and id of the pending task for each ledger, so it can be revoked
+NEXT_TASK_KEY = "ledger-next-task:{}"
+
+# Huey instances for other nodes' queues, and this module's tasks registered on them
+_queues = {}
+_queue_tasks = {}
+
+
+def _huey_for_queue(name):
+    if name == huey.name:
+        return huey
+    if name not in _queues:
+        _queues[name] = RedisHuey(name, host=REDIS_HOST, port=REDIS_PORT)
+    return _queues[name]
+
+
+def task_on_queue(task, name):
+    """Return `task` bound to the queue `name`, registering it there on first use."""
+    if name == huey.name:
+        return task
+    key = (name, task.task_class.__name__)
+    if key not in _queue_tasks:
+        _queue_tasks[key] = _huey_for_queue(name).task(
+            priority=task.task_class.default_priority, context=task.context
+        )(task.func)
+    return _queue_tasks[key]
+
+
+def schedule_for_ledger(task, name, args, eta=None, pending=True):
+    """
+    Enqueue `task` for ledger `name` on the queue of the worker node that owns the ledger.
+    Unless `pending` is False, it is remembered as the ledger's pending task.
+    """
+    queue = queue_name(node_for_ledger(name))
+    bound = task_on_queue(task, queue)
+    if eta is None:
+        result = bound(*args)
+    else:
+        result = bound.schedule(args=args, eta=eta)
+    if pending:
+        remember_next_task(name, queue, result.id)
+    return result
+
+
+def remember_next_task(name, queue, task_id):
+    get_redis_client().set(NEXT_TASK_KEY.format(name), json.dumps({"queue": queue, "id": task_id}))
+
+
+def revoke_next_task(name):
+    """Revoke a ledger's pending trade cycle so it frees its queue slot without running."""
+    pending = get_redis_client().getdel(NEXT_TASK_KEY.format(name))
+    if pending:
+        pending = json.loads(pending)
+        _huey_for_queue(pending["queue"]).revoke_by_id(pending["id"], revoke_once=True)
+
+
+def migrate_queue(name):
+    """
+    Move every pending and scheduled task of queue `name` to the nodes that now own their ledgers.
+    Periodic tasks are dropped, since every node enqueues its own, and so are tasks that cannot be read.
+    The source queue is only flushed once every task has been moved.
+    """
+    source = _huey_for_queue(name)
+    for task in TASKS.values():
+        task_on_queue(task, name)
+
+    tasks = []
+    for data in source.storage.enqueued_items() + source.storage.scheduled_items():
+        try:
+            message = source.serializer.deserialize(data)
+            if message.name.rsplit(".", 1)[-1] not in TASKS:
+                print(f"Dropping task '{message.name}' from queue '{name}'")
+                continue
+            task = source.deserialize_task(data)
+        except Exception as e:
+            print(f"Dropping unreadable task from queue '{name}': {e}")
+            continue
+        if not source.is_revoked(task):
+            tasks.append(task)
+
+    # the departed node must not be picked again from a stale ring
+    get_ring(refresh=True)
+
+    for task in tasks:
+        ledger_name = task.args[0]
+        queue = queue_name(node_for_ledger(ledger_name))
+        target = task_on_queue(TASKS[task.name], queue).huey
+        target.enqueue(task)
+
+        # keep revocation working if this was the ledger's pending task
+        pending = get_redis_client().get(NEXT_TASK_KEY.format(ledger_name))
+        if pending and json.loads(pending)["id"] == task.id:
+            remember_next_task(ledger_name, queue, task.id)
+
+    source.flush()
+    print(f"Migrated {len(tasks)} tasks from queue '{name}'")
+
+
+@huey.task(priority=10)
+def stop_ledger_container(name):
+    """Stop a ledger's trade container. Runs on the node that owns the ledger, which is where the container runs."""
+    stop_docker_container(ledger_container_name(name))
+
+
+def release_ledger(name):
+    """
+    Revoke a ledger's pending trade cycle and have its owner node stop its container if one is running.
+    Callers release a ledger after committing its new status, so failures are logged rather than raised.
+    """
+    try:
+        revoke_next_task(name)
+    except Exception as e:
+        print(f"Failed to revoke the pending trade cycle of ledger '{name}': {e}")
+    try:
+        schedule_for_ledger(stop_ledger_container, name, (name,), pending=False)
+    except Exception as e:
+        print(f"Failed to stop the container of ledger '{name}': {e}")
+
+
+def record_tick(name, tick_id, started_at, status, error=None):
+    """Store the outcome of a trade cycle in the tick log."""
+    try:
+        with get_db_connection() as conn:
+            stmt = insert(ledger_ticks).values(
+                ledger_name=name,
+                tick_id=tick_id,
+                started_at=started_at,
+                finished_at=datetime.now(),
+                status=status,
+                error=error,
+            ).on_conflict_do_nothing()
+            conn.execute(stmt)
+            conn.commit()
+    except Exception as e:
+        print(f"Failed to record tick {tick_id} for ledger '{name}': {e}")
+
+
+def _is_running(name):
+    info = lookup_ledger(name)
+    if info is None:
+        print(f"Ledger '{name}' no longer exists. Stopping cycle.")
+        return False
+    if info.status != RUNNING:
+        print(f"Ledger '{name}' is {info.status}. Stopping cycle.")
+        return False
+    return True
+
+
+@huey.task(context=True)
+def execute_trade_cycle(name, image_path, update_time, end_duration, start_time, task=None):
     """
     Execute a single trade and schedule the next one if not past the end time.
     This task recursively schedules itself
@@ -20,51 +194,88 @@ def execute_trade_cycle(name, image_path, update_time, end_duration, start_time)
     # Check if the current time is past the end time
     if datetime.now() > end_time:
         print(f"Ledger '{name}' has reached its end time. Stopping cycle.")
+        transition_ledger(name, {RUNNING}, STOPPED)
         return
 
-    # Check if ledger still exists in db
-    with get_db_connection() as conn:
-        stmt = select(ledger.c.name).where(ledger.c.name == name)
-        result = conn.execute(stmt).fetchone()
+    # Check if ledger still exists and has not been paused or stopped
+    if not _is_running(name):
+        return
 
-        if not result:
-            print(f"Ledger '{name}' no longer exists. Stopping cycle.")
-            return
+    # the model passes the tick id back to update_ledger, which uses it to drop retried updates.
+    # It is the task's id, so a re-executed or migrated tick keeps it and its updates are not applied twice
+    tick_id = task.id.replace("-", "") if task is not None else uuid4().hex
+    tick_started = datetime.now()
+    wall_started = time.monotonic()
+    container_usage = {}
 
     try:
-        print(f"Executing trade for ledger '{name}'")
+        print(f"Executing trade {tick_id} for ledger '{name}'")
+
+        # the image may not be on this node yet, e.g. after the ledger was rebalanced here
+        ensure_docker_image(image_path)
+
+        environment = {"LEDGER_NAME": name, "LEDGER_TICK_ID": tick_id}
+        # models read prices from the host's quote feed instead of each fetching their own
+        volumes = container_quote_volumes()
+        if volumes:
+            environment["LEDGER_QUOTE_SOCKET"] = CONTAINER_QUOTE_SOCKET
 
-        output = run_docker_container(
-            image_name=image_path,
-            command=None
-        )
+        # the container's output goes to the tick's log file, readable through /ledger_logs
+        with TickLogWriter(name, tick_id, tick_started) as log:
+            container_usage = stream_docker_container(
+                image_name=image_path,
+                output=log,
+                command=None,
+                container_name=ledger_container_name(name),
+                environment=environment,
+                volumes=volumes
+            )
 
-        logs = output.decode('utf-8')
-        print(f"Trade execution completed for '{name}'. Logs: {logs}")
+        print(f"Trade execution completed for '{name}'")
+        record_tick(name, tick_id, tick_started, "ok")
+        tick_errors = 0
 
     except Exception as e:
         print(f"Error executing trade for ledger '{name}': {e}")
+        record_tick(name, tick_id, tick_started, "error", str(e))
+        tick_errors = 1
+
+    record_usage(name, ticks=1, tick_errors=tick_errors, tick_seconds=time.monotonic() - wall_started, **container_usage)
+
+    try:
+        rotate_tick_logs(name)
+    except (OSError, ValueError) as e:
+        print(f"Failed to rotate tick logs of ledger '{name}': {e}")
+
+    # the ledger may have been paused or stopped while its container was running
+    if not _is_running(name):
+        return
 
     next_run = datetime.now() + timedelta(minutes=update_time)
     print(f"Scheduling next trade for '{name}' at {next_run}")
 
-    execute_trade_cycle.schedule(
-        args=(name, image_path, update_time, end_duration, start_time),
+    schedule_for_ledger(
+        execute_trade_cycle,
+        name,
+        (name, image_path, update_time, end_duration, start_time),
         eta=next_run
     )
 
 
 @huey.task()
-def run_ledger_trade(name, image_path, update_time, end_duration):
+def run_ledger_trade(name, image_path, update_time, end_duration, start_time=None):
     """
     Start the trading cycle for a ledger.
     This is the entry point task that initiates the recursive cycle.
+    When resuming a paused or crashed ledger, start_time is its persisted start time,
+    so the ledger still ends end_duration days after it was first started.
     """
-    start_time = datetime.now()
-    print(f"Initiating trading cycle for ledger '{name}' at {start_time}")
+    if start_time is None:
+        start_time = datetime.now()
+    print(f"Initiating trading cycle for ledger '{name}' at {datetime.now()}")
 
-    execute_trade_cycle(name, image_path,
-                        update_time, end_duration, start_time)
+    schedule_for_ledger(execute_trade_cycle, name,
+                        (name, image_path, update_time, end_duration, start_time))
 
     return {
         "success": True,
@@ -74,3 +285,137 @@ def run_ledger_trade(name, image_path, update_time, end_duration):
         "end_duration_days": end_duration,
         "estimated_end_time": (start_time + timedelta(days=end_duration)).isoformat()
     }
+
+
+
+def start_trade_cycle(name, update_time, end_duration, start_time, image=None):
+    """
+    Start a ledger's trading cycle on the worker node that owns it.
+    `image` is the ledger's registry reference; ledgers without one use the image tagged with their name.
+    """
+    return schedule_for_ledger(run_ledger_trade, name, (name, image or name, update_time, end_duration, start_time))
+
+
+@huey.task()
+def purge_ledger_history_task(name, deleted_at, image=None):
+    """
+    Delete the trade and value history, the tick logs and the image of a deleted ledger.
+    Runs on the node that owned the ledger, which is the node holding its pulled image.
+    """
+    with get_db_connection() as conn:
+        purged = purge_ledger_history(conn, name, deleted_at)
+        # a ledger re-created under the same name or a fork imported since may have the same image
+        if image is not None and image_in_use(conn, image):
+            print(f"Keeping image {image} of deleted ledger '{name}', another ledger uses it")
+            image = None
+    delete_ledger_logs(name)
+
+    if image is not None:
+        remove_docker_image(image)
+        delete_registry_image(image)
+    print(f"Purged {purged} history rows of deleted ledger '{name}'")
+
+
+def schedule_history_purge(name, image=None):
+    return schedule_for_ledger(
+        purge_ledger_history_task, name, (name, datetime.now(timezone.utc), image), pending=False
+    )
+
+
+# tasks by name, to re-bind deserialized tasks when migrating a queue
+TASKS = {
+    task.task_class.__name__: task
+    for task in (execute_trade_cycle, run_ledger_trade, purge_ledger_history_task, stop_ledger_container)
+}
+
+
+_heartbeat_thread = None
+_heartbeat_lock = threading.Lock()
+
+
+def _heartbeat_loop(node):
+    while True:
+        time.sleep(HEARTBEAT_INTERVAL_SECONDS)
+        try:
+            heartbeat(node)
+        except Exception as e:
+            print(f"Failed to heartbeat node '{node}': {e}")
+
+
+@huey.on_startup()
+def join_ring():
+    """
+    Join the placement ring and keep heartbeating from a thread of its own, so a node
+    whose workers are all busy with long trade cycles is not taken for departed.
+    """
+    global _heartbeat_thread
+    if NODE_ID is None:
+        return
+    # startup hooks run once per worker, but one heartbeat thread per process is enough
+    with _heartbeat_lock:
+        if _heartbeat_thread is None:
+            heartbeat(NODE_ID)
+            _heartbeat_thread = threading.Thread(target=_heartbeat_loop, args=(NODE_ID,), daemon=True)
+            _heartbeat_thread.start()
+
+
+@huey.periodic_task(crontab(minute="*"))
+def take_over_departed_nodes():
+    """Take over the queues of worker nodes that left the placement ring."""
+    if NODE_ID is None:
+        return
+    for node in departed_nodes():
+        if not claim_departed_node(node, NODE_ID):
+            continue
+        try:
+            migrate_queue(queue_name(node))
+        except Exception as e:
+            # the claim expires, so this or another node retries the migration
+            print(f"Failed to take over the queue of node '{node}': {e}")
+            continue
+        forget_node(node)
+
+
+# months of trade and value history to keep in Postgres; 0 keeps everything
+HISTORY_RETENTION_MONTHS = int(os.environ.get("LEDGER_HISTORY_RETENTION_MONTHS", "0"))
+
+MAINTENANCE_LOCK_KEY = "ledger-partition-maintenance"
+
+
+@huey.periodic_task(crontab(minute="0", hour="0"))
+def maintain_partitions():
+    """
+    Create this and next month's history partitions, and archive partitions past the retention period.
+    Runs on one node per day.
+    """
+    if not get_redis_client().set(MAINTENANCE_LOCK_KEY, huey.name, nx=True, ex=23 * 60 * 60):
+        return
+
+    now = datetime.now(timezone.utc)
+    with get_db_connection() as conn:
+        ensure_partitions(conn, now)
+        ensure_partitions(conn, next_month(month_start(now)))
+        conn.commit()
+
+        if HISTORY_RETENTION_MONTHS:
+            cutoff = month_start(now)
+            for _ in range(HISTORY_RETENTION_MONTHS):
+                cutoff = month_start(cutoff - timedelta(days=1))
+            archive_partitions(conn, cutoff)
+
+
+VALUATION_LOCK_KEY = "ledger-valuation"
+
+
+@huey.periodic_task(crontab(minute=f"*/{VALUATION_INTERVAL_MINUTES}"))
+def value_ledgers():
+    """Value every running ledger from one quote snapshot while the market is open. Runs on one node per interval."""
+    now = datetime.now(timezone.utc)
+    if not is_market_open(now):
+        return
+    if not get_redis_client().set(VALUATION_LOCK_KEY, huey.name, nx=True, ex=VALUATION_INTERVAL_MINUTES * 60 - 10):
+        return
+
+    with get_db_connection() as conn:
+        count = revalue_ledgers(conn, now)
+    print(f"Valued {count} ledgers at {now}")
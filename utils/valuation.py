@@ -0,0 +1,129 @@
+"""
+Periodic valuation of every running ledger.
+
+Once per interval, while the market is open, one quote snapshot is fetched for the union of all
+tickers held by running ledgers. Every ledger is then valued in a single matrix product
+(holdings x prices + balances), and the value points are bulk-inserted into ledger_values, so
+quiet ledgers still get a fresh value and active ones don't each fetch their own quotes.
+The snapshot is also kept in Redis for update_ledger to reuse while it is fresh.
+"""
+from datetime import time
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from utils.db_config import ledger, ledger_values
+from utils.lazy_imports import lazy_import
+from utils.ledger_cache import invalidate_views
+from utils.ledger_events import ledger_update_event, publish_ledger_updates
+from utils.ledger_state import RUNNING
+from utils.ledger_utils import get_current_prices
+from utils.partitions import ensure_partitions
+from utils.redis_utils import get_redis_client
+
+np = lazy_import("numpy")
+
+VALUATION_INTERVAL_MINUTES = 5
+
+QUOTES_KEY = "ledger-quotes"
+
+# regular NYSE/Nasdaq session; exchange holidays are not accounted for
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+MARKET_OPEN = time(9, 30)
+MARKET_CLOSE = time(16, 0)
+
+
+def is_market_open(now):
+    """Whether `now` (timezone-aware) falls in a regular US trading session."""
+    local = now.astimezone(MARKET_TIMEZONE)
+    return local.weekday() < 5 and MARKET_OPEN <= local.time() < MARKET_CLOSE
+
+
+def store_quote_snapshot(prices):
+    """Keep a quote snapshot for other processes until the next valuation is due."""
+    if not prices:
+        return
+    pipeline = get_redis_client().pipeline()
+    pipeline.delete(QUOTES_KEY)
+    pipeline.hset(QUOTES_KEY, mapping=prices)
+    pipeline.expire(QUOTES_KEY, VALUATION_INTERVAL_MINUTES * 60)
+    pipeline.execute()
+
+
+def get_quote_snapshot(tickers):
+    """Prices of `tickers` from the latest snapshot. Tickers missing from it are left out."""
+    tickers = list(tickers)
+    if not tickers:
+        return {}
+    try:
+        prices = get_redis_client().hmget(QUOTES_KEY, tickers)
+    except Exception as e:
+        print(f"Failed to read quote snapshot: {e}")
+        return {}
+    return {ticker: float(price) for ticker, price in zip(tickers, prices) if price is not None}
+
+
+def value_portfolios(holdings, balances, prices):
+    """
+    Value many portfolios at once.
+
+    Args:
+        holdings (list): One {ticker: quantity} dict per ledger.
+        balances (list): Cash balance of each ledger.
+        prices (dict): {ticker: price} snapshot.
+
+    Returns:
+        array: Total value of each ledger; NaN where a held ticker has no price.
+    """
+    tickers = sorted({ticker for holding in holdings for ticker in holding})
+    column = {ticker: i for i, ticker in enumerate(tickers)}
+
+    quantities = np.zeros((len(holdings), len(tickers)))
+    for row, holding in enumerate(holdings):
+        for ticker, quantity in holding.items():
+            quantities[row, column[ticker]] = quantity
+
+    price_vector = np.array([prices.get(ticker, np.nan) for ticker in tickers])
+    # a ledger with zero quantity of an unpriced ticker is still valued
+    stock_values = np.where(quantities != 0, quantities * price_vector, 0.0).sum(axis=1)
+    return np.asarray(balances, dtype=float) + stock_values
+
+
+def revalue_ledgers(conn, now):
+    """
+    Value every running ledger at `now` and store the value points.
+
+    Returns:
+        int: Number of ledgers valued.
+    """
+    rows = conn.execute(
+        select(ledger.c.name, ledger.c.holding, ledger.c.balance).where(ledger.c.status == RUNNING)
+    ).fetchall()
+    if not rows:
+        return 0
+
+    holdings = [row.holding or {} for row in rows]
+    tickers = sorted({ticker for holding in holdings for ticker, quantity in holding.items() if quantity})
+    prices = get_current_prices(tickers)
+    store_quote_snapshot(prices)
+
+    values = value_portfolios(holdings, [float(row.balance) for row in rows], prices)
+
+    points = []
+    events = []
+    for row, holding, value in zip(rows, holdings, values):
+        if np.isnan(value):
+            print(f"Skipping valuation of ledger '{row.name}': missing prices")
+            continue
+        points.append({"ledger_name": row.name, "recorded_at": now, "value": float(value)})
+        events.append(ledger_update_event(row.name, now, [], holding, float(row.balance), float(value)))
+
+    if points:
+        ensure_partitions(conn, now)
+        conn.execute(insert(ledger_values).on_conflict_do_nothing(), points)
+        conn.commit()
+        invalidate_views([point["ledger_name"] for point in points])
+        publish_ledger_updates(events)
+
+    return len(points)
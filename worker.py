@@ -0,0 +1,5 @@
+"""
+Huey worker entry point: `huey_consumer worker.huey`.
+Loads only the scheduled tasks, not the Flask app or its endpoints.
+"""
+from utils.tasks import huey, execute_trade_cycle, run_ledger_trade
@@ -0,0 +1,9 @@
+"""
+API entry point, e.g. `gunicorn wsgi:app`.
+Only the Flask app is loaded here; the trade cycle code is imported for enqueueing, but its heavy
+dependencies (docker, yfinance) are deferred until an endpoint actually needs them.
+"""
+from app import app
+
+if __name__ == "__main__":
+    app.run()